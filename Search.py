@@ -1,7 +1,11 @@
 import streamlit as st
 st.set_page_config(page_title="Classy Search", layout="wide", page_icon="🎨")
 
-from app import search
+from app import startup
+
+with startup.phase("app_import"):
+    from app import search
 
 if __name__ == "__main__":
     search.render()
+    startup.warm_up()
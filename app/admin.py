@@ -1,5 +1,71 @@
+import pandas as pd
 import streamlit as st
-from app.data_utils import art_df
+from app import config
+from app.clip_utils import get_pool as clip_pool
+from app.data_utils import art_df, open_store, sku_index
+from app.dedupe import DuplicateStore
+from app.embedding import text_cache
+from app.metrics import metrics
+from app.qdrant_utils import query_cache
+from app.result_store import result_store
+from app.startup import report as startup_report
+from app.thumbnails import thumbnail_cache
+
+
+def _duplicate_store() -> DuplicateStore | None:
+    return open_store(DuplicateStore, config.DUPLICATES_DB)
+
+
+def near_duplicates() -> None:
+    """Browse the clusters written by ``python -m app.dedupe``."""
+    store = _duplicate_store()
+    run = store.run() if store is not None else None
+    if run is None:
+        st.info("No near-duplicate scan yet. Run `python -m app.dedupe` to find duplicate artworks.")
+        return
+    thresholds = ", ".join(f"{name} ≥ {t:g}" for name, t in run["thresholds"].items())
+    st.caption(
+        f"{run['clusters']:,} clusters ({run['pairs']:,} pairs) among {run['items']:,} items, "
+        f"scanned {run['finished']} ({run['require']} of {thresholds})."
+    )
+    clusters = store.clusters()
+    if not clusters:
+        st.success("No near-duplicates found.")
+        return
+    by_id = {c["cluster"]: c for c in clusters}
+    cluster = st.selectbox(
+        "Cluster", list(by_id),
+        format_func=lambda c: f"#{c}: {by_id[c]['size']} items, similarity {by_id[c]['score']:.3f}",
+    )
+    skus = store.members(cluster)
+    positions = sku_index.first_positions(skus)
+    cols = st.columns(min(len(skus), 5))
+    for i, (sku, pos) in enumerate(zip(skus, positions)):
+        with cols[i % len(cols)]:
+            if pos < 0:
+                st.caption(f"{sku} (no longer in the catalog)")
+                continue
+            row = art_df.iloc[pos]
+            img_url = row.get("main_image_file")
+            if isinstance(img_url, str) and img_url:
+                st.image(img_url, caption=row.get("product_name"), use_container_width=True)
+            st.caption(sku)
+    st.dataframe(pd.DataFrame(store.pairs(cluster)), hide_index=True)
+
+
+@st.fragment(run_every=5)
+def _live_performance() -> None:
+    snapshot = metrics.snapshot()
+    if not snapshot:
+        st.info("No searches recorded since the server started.")
+        return
+    st.dataframe(
+        pd.DataFrame.from_dict(snapshot, orient="index").rename_axis("stage"),
+        column_config={
+            col: st.column_config.NumberColumn(format="%.1f")
+            for col in ("mean_ms", "p50_ms", "p95_ms", "p99_ms")
+        },
+    )
 
 
 def render() -> None:
@@ -10,3 +76,75 @@ def render() -> None:
     st.write(f"Dataset contains **{len(art_df)}** products.")
     st.write("Columns:", ", ".join(art_df.columns))
     st.dataframe(art_df.head())
+
+    st.subheader("Embedding cache")
+    st.json(text_cache.stats())
+    if st.button("Clear text embedding cache"):
+        text_cache.invalidate()
+        st.success("Text embedding cache cleared.")
+
+    st.subheader("Search result cache")
+    st.json(query_cache.stats())
+    if st.button("Clear search result cache"):
+        query_cache.clear()
+        st.success("Search result cache cleared.")
+
+    st.subheader("Session results")
+    st.caption("Search results held for active sessions (row positions and scores only).")
+    st.json(result_store.stats())
+
+    st.subheader("Thumbnail cache")
+    if thumbnail_cache is None:
+        st.caption("Disabled (THUMBNAIL_CACHE_DIR is empty); result cards load the original images.")
+    else:
+        st.caption(
+            f"{thumbnail_cache.width}px {thumbnail_cache.format.upper()} thumbnails in "
+            f"`{thumbnail_cache.directory}`; MB downloaded vs stored since this process started."
+        )
+        st.json(thumbnail_cache.stats())
+        if st.button("Clear thumbnail cache"):
+            thumbnail_cache.clear()
+            st.success("Thumbnail cache cleared.")
+
+    st.subheader("Near-duplicates")
+    near_duplicates()
+
+    st.subheader("CLIP endpoints")
+    st.caption(
+        "Image embedding requests in this server process: duplicates sent to a second endpoint "
+        "after a slow first response (hedges), retries after failures, and each endpoint's "
+        "latency and circuit-breaker state."
+    )
+    pool_stats = clip_pool().stats()
+    st.json({k: v for k, v in pool_stats.items() if k != "endpoints"})
+    st.dataframe(pd.DataFrame(pool_stats["endpoints"]), hide_index=True)
+
+    st.subheader("Startup")
+    st.caption(
+        "Seconds spent importing the app and loading the catalog in this server process, "
+        "and in warming the Qdrant, OpenAI and CLIP connections in the background."
+    )
+    st.json(startup_report())
+
+    st.subheader("Performance")
+    st.caption(
+        "Per-stage latency in this server process (percentiles over the most recent calls; "
+        "errors and timeouts are counted separately and excluded from the latencies). "
+        "Refreshes every 5 seconds."
+    )
+    _live_performance()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.download_button(
+            "Download snapshot (JSON lines)", lambda: metrics.to_json_line() + "\n",
+            "metrics.jsonl", mime="application/jsonl",
+        )
+    with col2:
+        st.download_button(
+            "Download Prometheus metrics", metrics.to_prometheus,
+            "metrics.prom", mime="text/plain",
+        )
+    with col3:
+        if st.button("Reset performance metrics"):
+            metrics.reset()
+            st.success("Performance metrics reset.")
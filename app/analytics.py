@@ -1,17 +1,45 @@
-import altair as alt
 import streamlit as st
 import pandas as pd
 
-from app.data_utils import art_df
-from app import openai_utils
+from app import config
+from app.data_utils import art_df, open_store, sku_index
+from app.enrich import EnrichmentStore, description_hash
 
 
-def placeholder_ai_tools():
-    example_desc = art_df["description"].dropna().iloc[0]
+def _enrichment_store() -> EnrichmentStore | None:
+    return open_store(EnrichmentStore, config.ENRICHMENT_DB)
+
+
+@st.cache_data(ttl=300)
+def _enrichment_coverage() -> tuple[int, int]:
+    hashes = list({description_hash(d) for d in art_df["description"].dropna()})
+    return len(_enrichment_store().current(hashes, config.ENRICHMENT_MODEL)), len(hashes)
+
+
+def ai_insights():
+    """Summaries and tags precomputed by ``python -m app.enrich``."""
+    store = _enrichment_store()
+    if store is None:
+        st.info("No AI enrichment yet. Run `python -m app.enrich` to generate summaries and tags.")
+        return
+    enriched, total = _enrichment_coverage()
+    st.caption(f"{enriched:,} of {total:,} distinct descriptions enriched.")
+
+    described = art_df["description"].notna()
+    default_sku = art_df["sku"][described].iloc[0] if described.any() else ""
+    sku = st.text_input("SKU", value=default_sku)
+    positions = sku_index.positions(sku)
+    if not len(positions):
+        st.warning(f"No product found with SKU `{sku}`.")
+        return
+    description = art_df["description"].iat[positions[0]]
+    result = store.get(description) if isinstance(description, str) else None
+    if result is None:
+        st.write("This description has not been enriched yet.")
+        return
     st.subheader("AI‑Generated Summary")
-    st.write(openai_utils.summarize_description(example_desc))
-    tags = openai_utils.generate_tags(example_desc)
-    st.write("Suggested tags:", ", ".join(tags))
+    st.write(result["summary"])
+    st.write("Suggested tags:", ", ".join(result["tags"]))
 
 
 def render() -> None:
@@ -30,6 +58,8 @@ def render() -> None:
             counts = bins.value_counts().sort_index().reset_index()
             counts.columns = ["range", "count"]
             st.subheader("Price distribution")
+            import altair as alt
+
             chart = alt.Chart(counts).mark_bar().encode(
                 x="range:N", y="count:Q", tooltip=["range", "count"]
             )
@@ -40,4 +70,4 @@ def render() -> None:
     st.bar_chart(top_cats)
 
     with st.expander("AI Insights (beta)"):
-        placeholder_ai_tools()
+        ai_insights()
@@ -0,0 +1,175 @@
+# app/api.py
+
+"""Headless JSON search API over ``app.search_core``.
+
+    uvicorn app.api:app --host 0.0.0.0 --port 8000
+
+Endpoints (bodies are JSON; images are base64-encoded file contents):
+
+    POST /search/text     {"query": "...", "top_k": 10, "offset": 0, "depth": 100, "filters": {"style": ["Modern"]}}
+    POST /search/image    {"image": "<base64>", ...}
+    POST /search/hybrid   {"query": "...", "image": "<base64>", ...}   (either or both)
+    POST /search/similar  {"sku": "..."} or {"id": "..."}, optional "vector": "image" | "text"
+    GET  /sku/{sku}
+    GET  /health
+    GET  /metrics         (Prometheus text format)
+
+Searches answer ``{"results": [{"id", "score", "payload"}], "errors": {...}}``;
+``errors`` names embedding providers that failed while the others were still
+used.  Qdrant only returns each hit's SKU; payloads are filled in from the
+local catalog (and from Qdrant for SKUs missing there).  ``fields`` selects
+the payload keys returned (default: the card fields); ``null`` returns the
+full payload.  Clients paging with ``offset`` should send the same ``depth``
+(the total number of hits they will page through) with every page, so the
+pages are slices of one ranking; it defaults to ``offset + top_k``.
+"""
+
+import asyncio
+import base64
+import binascii
+import json
+from contextlib import asynccontextmanager
+from io import BytesIO
+from typing import Literal
+
+import numpy as np
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from PIL import Image, UnidentifiedImageError
+from pydantic import BaseModel, Field
+
+from app import qdrant_utils, search_core, startup
+from app.metrics import metrics
+from app.qdrant_utils import CARD_FIELDS
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    # Hits are hydrated from the catalog; load it before serving, off the loop.
+    with startup.phase("catalog_load"):
+        await asyncio.to_thread(search_core.load_catalog)
+    startup.warm_up()
+    # The async Qdrant client belongs to this event loop, so it is warmed here
+    # rather than on the start-up threads.
+    warm_qdrant = asyncio.create_task(qdrant_utils.acollection_version())
+    yield
+    warm_qdrant.cancel()
+
+
+app = FastAPI(title="Classy Search API", lifespan=_lifespan)
+
+
+@app.middleware("http")
+async def _time_request(request: Request, call_next):
+    with metrics.timed("api_request"):
+        return await call_next(request)
+
+
+class SearchRequest(BaseModel):
+    top_k: int = Field(10, ge=1, le=500)
+    offset: int = Field(0, ge=0)
+    depth: int | None = Field(None, ge=1, le=10000)
+    filters: dict[str, list[str] | str] = {}
+    fields: list[str] | None = CARD_FIELDS
+
+
+class TextSearch(SearchRequest):
+    query: str = Field(min_length=1)
+
+
+class ImageSearch(SearchRequest):
+    image: str
+
+
+class HybridSearch(SearchRequest):
+    query: str | None = None
+    image: str | None = None
+
+
+class SimilarSearch(SearchRequest):
+    sku: str | None = None
+    id: int | str | None = None
+    vector: Literal["image", "text"] = "image"
+
+
+def _decode_image(data: str) -> Image.Image:
+    try:
+        with Image.open(BytesIO(base64.b64decode(data, validate=True))) as img:
+            return img.convert("RGB")
+    except (binascii.Error, UnidentifiedImageError, OSError) as e:
+        raise HTTPException(400, f"image is not a base64-encoded picture: {e}")
+
+
+async def _hits(points: list, fields: list[str] | None) -> list[dict]:
+    """Hits with hydrated payloads, cut down to ``fields`` (all if ``None``)."""
+    payloads = await search_core.afull_payloads(points)
+    if fields is not None:
+        payloads = [{k: pl[k] for k in fields if k in pl} for pl in payloads]
+    # Catalog rows hold numpy scalars, which the JSON encoder rejects.
+    payloads = [{k: v.item() if isinstance(v, np.generic) else v for k, v in pl.items()} for pl in payloads]
+    return [search_core.hit_dict(p, pl) for p, pl in zip(points, payloads)]
+
+
+async def _run(req: SearchRequest, image: Image.Image | None, text: str | None) -> dict:
+    vectors, errors = await search_core.aembed_query(image, text)
+    if not vectors:
+        raise HTTPException(503, {"message": "no embeddings could be computed", "errors": errors})
+    points = await search_core.asearch(vectors, req.top_k, req.filters, ["sku"], req.offset, req.depth)
+    return {"results": await _hits(points, req.fields), "errors": errors}
+
+
+@app.post("/search/text")
+async def search_text(req: TextSearch) -> dict:
+    return await _run(req, None, req.query)
+
+
+@app.post("/search/image")
+async def search_image(req: ImageSearch) -> dict:
+    return await _run(req, _decode_image(req.image), None)
+
+
+@app.post("/search/hybrid")
+async def search_hybrid(req: HybridSearch) -> dict:
+    if not req.query and not req.image:
+        raise HTTPException(422, "give a query, an image, or both")
+    return await _run(req, _decode_image(req.image) if req.image else None, req.query)
+
+
+@app.post("/search/similar")
+async def search_similar(req: SimilarSearch) -> dict:
+    point_id = req.id
+    if point_id is None:
+        if not req.sku:
+            raise HTTPException(422, "give a sku or an id")
+        # Qdrant matches the payload SKU exactly; accept what GET /sku accepts.
+        point_id = await search_core.afind_point_id(search_core.catalog_sku(req.sku) or req.sku)
+        if point_id is None:
+            raise HTTPException(404, f"SKU {req.sku!r} is not indexed")
+    points = await search_core.asimilar(
+        point_id, vector_name=req.vector, top_k=req.top_k,
+        payload_filters=req.filters, payload_fields=["sku"], offset=req.offset,
+    )
+    return {"results": await _hits(points, req.fields), "errors": {}}
+
+
+@app.get("/sku/{sku}")
+def sku_lookup(sku: str) -> dict:
+    # Plain def: the catalog lookup is CPU-bound, so FastAPI runs it in its thread pool.
+    rows = search_core.lookup_sku(sku)
+    if rows.empty:
+        raise HTTPException(404, f"SKU {sku!r} not found")
+    # Round-trip through pandas' JSON writer to get plain Python scalars.
+    return {"results": json.loads(rows.to_json(orient="records"))}
+
+
+@app.get("/health")
+async def health() -> dict:
+    try:
+        await qdrant_utils.get_async_client().get_collection(qdrant_utils.COLLECTION_NAME)
+    except Exception as e:
+        raise HTTPException(503, f"Qdrant unavailable: {e}")
+    return {"status": "ok", "startup": startup.report()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics() -> str:
+    return metrics.to_prometheus()
@@ -0,0 +1,102 @@
+# app/batch_search.py
+
+"""Search the catalog with many query images at once."""
+
+import os
+import zipfile
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from io import BytesIO
+from typing import IO
+
+from PIL import Image
+
+from app import config
+from app.embedding import get_image_embedding
+from app.qdrant_utils import batch_vector_search
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+# Separate from the interactive embedding pool so a large batch cannot starve
+# other sessions' searches.
+_executor = ThreadPoolExecutor(max_workers=config.BATCH_IMAGE_WORKERS, thread_name_prefix="batch-embed")
+
+
+def _zip_image_entries(archive: zipfile.ZipFile) -> list[zipfile.ZipInfo]:
+    return [
+        info for info in archive.infolist()
+        if not info.is_dir()
+        and not info.filename.startswith("__MACOSX/")
+        and not os.path.basename(info.filename).startswith(".")
+        and info.filename.lower().endswith(IMAGE_EXTENSIONS)
+    ]
+
+
+def count_zip_images(file: IO[bytes]) -> int:
+    with zipfile.ZipFile(file) as archive:
+        return len(_zip_image_entries(archive))
+
+
+def iter_zip_images(file: IO[bytes]) -> Iterator[tuple[str, bytes]]:
+    """Yield ``(name, bytes)`` for every image file inside a ZIP archive."""
+    with zipfile.ZipFile(file) as archive:
+        for info in _zip_image_entries(archive):
+            yield info.filename, archive.read(info)
+
+
+def _embed_bytes(data: bytes) -> list[float]:
+    with Image.open(BytesIO(data)) as img:
+        return get_image_embedding(img.convert("RGB"))
+
+
+def iter_batch_image_search(
+    items: Iterable[tuple[str, bytes]],
+    top_k: int,
+    payload_filters: dict | None = None,
+    payload_fields: list[str] | None = None,
+    embed: Callable[[bytes], list[float]] = _embed_bytes,
+) -> Iterator[tuple[str, list | None, str | None]]:
+    """Embed images concurrently and search them in batched round trips.
+
+    Yields ``(name, points, error)`` per image as soon as its results are
+    back.  Whatever embeddings have finished while the previous Qdrant
+    request was in flight are sent together in one ``query_batch_points``
+    call (at most ``BATCH_QUERY_SIZE`` queries), so the batch is bounded by
+    embedding concurrency rather than by per-image round trips.
+    """
+    items = iter(items)
+    pending = {}
+    # Images are read from ``items`` lazily, a few per worker, so a large ZIP
+    # is never held in memory all at once.
+    max_pending = 2 * config.BATCH_IMAGE_WORKERS
+
+    def submit_more():
+        for name, data in items:
+            pending[_executor.submit(embed, data)] = name
+            if len(pending) >= max_pending:
+                return
+
+    submit_more()
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        ready = []
+        for future in done:
+            name = pending.pop(future)
+            try:
+                ready.append((name, future.result()))
+            except Exception as e:
+                yield name, None, f"embedding failed: {e}"
+        # Keep the workers busy while the Qdrant request is in flight.
+        submit_more()
+        for start in range(0, len(ready), config.BATCH_QUERY_SIZE):
+            chunk = ready[start:start + config.BATCH_QUERY_SIZE]
+            try:
+                results = batch_vector_search(
+                    [vec for _, vec in chunk], "image", top_k, payload_filters, payload_fields
+                )
+            except Exception as e:
+                for name, _ in chunk:
+                    yield name, None, f"search failed: {e}"
+                continue
+            for (name, _), points in zip(chunk, results):
+                yield name, points, None
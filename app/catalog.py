@@ -0,0 +1,99 @@
+# app/catalog.py
+
+"""Build and read the columnar (Arrow IPC) copy of the product catalog.
+
+The CSV is parsed once at build time; the app then memory-maps the Arrow
+file, so several Streamlit workers on one box share the same page cache
+instead of each holding a parsed copy.
+
+    python -m app.catalog                # data/products_05_13.csv -> data/products.arrow
+    python -m app.catalog --csv other.csv --out other.arrow
+"""
+
+import argparse
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+from app import config
+
+# Low-cardinality filter columns stored dictionary-encoded.
+CATEGORICAL_COLUMNS = ["style", "category", "class", "occasion", "orientation", "country_of_origin"]
+
+
+def build_catalog(csv_path: str = config.CATALOG_CSV, out_path: str = config.CATALOG_ARROW) -> pa.Table:
+    """Convert the catalog CSV into an uncompressed Arrow IPC file."""
+    table = pacsv.read_csv(
+        csv_path,
+        convert_options=pacsv.ConvertOptions(
+            # The export writes missing values as the literal string "NaN".
+            null_values=["", "NaN", "nan", "NA", "N/A", "null"],
+            strings_can_be_null=True,
+        ),
+    )
+    for col in CATEGORICAL_COLUMNS:
+        idx = table.schema.get_field_index(col)
+        if idx >= 0 and pa.types.is_string(table.schema.field(idx).type):
+            table = table.set_column(idx, col, table.column(col).dictionary_encode())
+
+    tmp_path = f"{out_path}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, out_path)
+    return table
+
+
+def _types_mapper(arrow_type: pa.DataType):
+    # Keep strings in Arrow memory (zero-copy from the mapped file) instead of
+    # materialising a Python object per cell.
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return pd.StringDtype("pyarrow")
+    return None
+
+
+def read_catalog(path: str = config.CATALOG_ARROW) -> pd.DataFrame:
+    """Memory-map the Arrow catalog and wrap it in a DataFrame."""
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    return table.to_pandas(types_mapper=_types_mapper)
+
+
+def read_catalog_csv(path: str = config.CATALOG_CSV) -> pd.DataFrame:
+    """Fallback loader used when the Arrow file has not been built."""
+    df = pd.read_csv(path)
+    df.replace("NaN", np.nan, inplace=True)
+    return df
+
+
+def is_stale(csv_path: str = config.CATALOG_CSV, arrow_path: str = config.CATALOG_ARROW) -> bool:
+    """True if the Arrow file is missing or older than the CSV."""
+    if not os.path.exists(arrow_path):
+        return True
+    return os.path.exists(csv_path) and os.path.getmtime(csv_path) > os.path.getmtime(arrow_path)
+
+
+def load_catalog(csv_path: str = config.CATALOG_CSV, arrow_path: str = config.CATALOG_ARROW) -> pd.DataFrame:
+    """The Arrow catalog, or the CSV if the Arrow file is missing or stale."""
+    if not is_stale(csv_path, arrow_path):
+        return read_catalog(arrow_path)
+    logging.warning(
+        f"{arrow_path} missing or older than {csv_path}; "
+        "falling back to the CSV (run `python -m app.catalog` to build it)."
+    )
+    return read_catalog_csv(csv_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=config.CATALOG_CSV)
+    parser.add_argument("--out", default=config.CATALOG_ARROW)
+    args = parser.parse_args()
+    table = build_catalog(args.csv, args.out)
+    print(f"Wrote {table.num_rows} rows, {table.num_columns} columns to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
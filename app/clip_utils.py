@@ -1,36 +1,164 @@
 # app/clip_utils.py
 
-import numpy as np
-from gradio_client import Client, handle_file
+from __future__ import annotations
+
+import json
 import logging
+import threading
+import time
+from typing import TYPE_CHECKING
 
-HUGGING_FACE_URL = "elev802/CLIP-Large-Image-Search"
+import numpy as np
 
-def generate_image_embedding(file_path):
+from app import config
+from app.endpoint_pool import Endpoint, EndpointPool
+from app.metrics import metrics
+
+if TYPE_CHECKING:
+    import httpx
+    from gradio_client import Client
+
+HUGGING_FACE_URL = config.CLIP_ENDPOINT
+EMBEDDING_DIM = config.IMAGE_EMBEDDING_DIM
+
+_client_lock = threading.Lock()
+
+
+def _endpoint_client(endpoint: Endpoint, timeout: float = config.CLIP_TIMEOUT) -> Client:
+    """The long-lived Gradio client for one endpoint, built on first use."""
+    if endpoint.client is None:
+        with _client_lock:
+            if endpoint.client is None:
+                # Imported here: gradio_client is slow to import and only
+                # image search needs it.
+                from gradio_client import Client
+                endpoint.client = Client(endpoint.url, verbose=False, httpx_kwargs={"timeout": timeout})
+    return endpoint.client
+
+
+def _predict(endpoint: Endpoint, data: bytes, filename: str, timeout: float) -> list[float]:
+    """One embedding attempt against one endpoint, bounded by ``timeout`` seconds."""
+    deadline = time.monotonic() + timeout
+    client = _endpoint_client(endpoint, timeout)
+    with metrics.timed("clip_upload"):
+        server_path = _upload_bytes(client, data, filename, max(0.0, deadline - time.monotonic()))
+    # The file is already in the Space's cache, so pass a FileData dict
+    # without the "meta" marker; gradio_client would otherwise try to
+    # upload it again from the local filesystem.
+    with metrics.timed("clip_predict"):
+        job = client.submit(image={"path": server_path, "orig_name": filename}, api_name="/predict")
+        try:
+            result = job.result(timeout=max(0.0, deadline - time.monotonic()))
+        except TimeoutError:
+            job.cancel()
+            raise
+    return parse_embedding(result)
+
+
+def get_pool() -> EndpointPool:
+    """Return the process-wide pool over ``CLIP_ENDPOINTS``."""
+    if not hasattr(get_pool, "instance"):
+        with _client_lock:
+            if not hasattr(get_pool, "instance"):
+                get_pool.instance = EndpointPool(
+                    config.CLIP_ENDPOINTS,
+                    _predict,
+                    timeout=config.CLIP_TIMEOUT,
+                    hedge_quantile=config.CLIP_HEDGE_QUANTILE,
+                    hedge_delay=config.CLIP_HEDGE_DELAY,
+                    max_attempts=config.CLIP_MAX_ATTEMPTS,
+                    failure_threshold=config.CLIP_BREAKER_FAILURES,
+                    reset_after=config.CLIP_BREAKER_RESET,
+                    workers=2 * max(config.EMBEDDING_WORKERS, config.BATCH_IMAGE_WORKERS) * config.CLIP_MAX_ATTEMPTS,
+                )
+    return get_pool.instance
+
+
+def get_client() -> Client:
+    """Return the long-lived Gradio client for the primary CLIP endpoint."""
+    return _endpoint_client(get_pool().endpoints[0])
+
+
+def _get_http() -> httpx.Client:
+    """Pooled HTTP client used for uploading image bytes to the Spaces."""
+    if not hasattr(_get_http, "instance"):
+        with _client_lock:
+            if not hasattr(_get_http, "instance"):
+                import httpx
+                _get_http.instance = httpx.Client(timeout=config.CLIP_TIMEOUT)
+    return _get_http.instance
+
+
+def warm_up() -> None:
+    """Connect to every endpoint ahead of the first image query.
+
+    Building a Gradio client fetches the Space config; the extra request
+    opens a pooled upload connection so the first upload skips the handshake.
+    Raises if no endpoint could be reached.
     """
-    Generate image embedding using the Hugging Face Space with the CLIP model.
-    :param file_path: Path to the image file.
+    errors = []
+    for endpoint in get_pool().endpoints:
+        try:
+            _get_http().head(_endpoint_client(endpoint).src)
+        except Exception as e:
+            errors.append(f"{endpoint.url}: {e}")
+    if len(errors) == len(get_pool().endpoints):
+        raise RuntimeError("; ".join(errors))
+    for error in errors:
+        logging.warning(f"CLIP endpoint unreachable at start-up: {error}")
+
+
+def _upload_bytes(client: Client, data: bytes, filename: str, timeout: float = config.CLIP_TIMEOUT) -> str:
+    """Upload ``data`` to the Space's file cache and return the server-side path."""
+    resp = _get_http().post(
+        client.upload_url,
+        headers=client.headers,
+        cookies=client.cookies,
+        files=[("files", (filename, data))],
+        timeout=timeout,
+    )
+    resp.raise_for_status()
+    return resp.json()[0]
+
+
+def parse_embedding(result) -> list[float]:
+    """Normalise the Space's reply (JSON string, list or array) to a list."""
+    if isinstance(result, str):
+        embedding = np.asarray(json.loads(result), dtype=np.float64)
+    elif isinstance(result, (list, np.ndarray)):
+        embedding = np.asarray(result, dtype=np.float64)
+    else:
+        raise ValueError("Unexpected response format from Hugging Face API")
+    if embedding.ndim == 2 and embedding.shape[0] == 1:
+        embedding = embedding[0]
+    embedding = embedding.tolist()
+    assert len(embedding) == EMBEDDING_DIM, f"Embedding length is {len(embedding)}, should be {EMBEDDING_DIM}"
+    return embedding
+
+
+def generate_image_embedding_from_bytes(data: bytes, filename: str = "image.jpg") -> list[float]:
+    """
+    Generate an image embedding from encoded image bytes without touching disk.
+    The request is routed, hedged and retried across ``CLIP_ENDPOINTS``.
+    :param data: Encoded image (JPEG/PNG) bytes.
+    :param filename: Name reported to the Space; its suffix selects the format.
     :return: The embedding vector for the image as a list.
+    :raises TimeoutError: if no endpoint answered within ``CLIP_TIMEOUT``.
+    :raises EndpointsUnavailable: if every endpoint's circuit breaker is open.
     """
     try:
-        client = Client(HUGGING_FACE_URL)
-        result = client.predict(
-            image=handle_file(file_path),
-            api_name="/predict",
-        )
-        print("Raw result:", result)
-        # If string, parse properly
-        if isinstance(result, str):
-            embedding = np.fromstring(result.strip('[]'), sep=',')
-        elif isinstance(result, (list, np.ndarray)):
-            embedding = np.array(result)
-            if embedding.ndim == 2 and embedding.shape[0] == 1:
-                embedding = embedding[0]
-        else:
-            raise ValueError("Unexpected response format from Hugging Face API")
-        embedding = embedding.tolist()
-        assert len(embedding) == 768, f"Embedding length is {len(embedding)}, should be 768"
-        return embedding
+        return get_pool().call(data, filename)
     except Exception as e:
         logging.error(f"Error in generate_image_embedding: {e}")
-        raise
\ No newline at end of file
+        raise
+
+
+def generate_image_embedding(file_path):
+    """
+    Generate image embedding using the Hugging Face Space with the CLIP model.
+    :param file_path: Path to the image file.
+    :return: The embedding vector for the image as a list.
+    """
+    with open(file_path, "rb") as f:
+        data = f.read()
+    return generate_image_embedding_from_bytes(data, filename=str(file_path).rsplit("/", 1)[-1])
@@ -0,0 +1,69 @@
+# app/color_index.py
+
+"""Precomputed index of the catalog's distinct dominant colours."""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+_HEX_RE = re.compile(r"^#?([0-9a-fA-F]{6})$")
+
+
+def _srgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """Convert an ``(n, 3)`` uint8 sRGB array to CIELAB (D65)."""
+    c = rgb.astype(np.float32) / 255.0
+    c = np.where(c > 0.04045, ((c + 0.055) / 1.055) ** 2.4, c / 12.92)
+    m = np.array(
+        [[0.4124, 0.3576, 0.1805], [0.2126, 0.7152, 0.0722], [0.0193, 0.1192, 0.9505]],
+        dtype=np.float32,
+    )
+    xyz = c @ m.T / np.array([0.95047, 1.0, 1.08883], dtype=np.float32)
+    f = np.where(xyz > 216 / 24389, np.cbrt(xyz), (24389 / 27 * xyz + 16) / 116)
+    return np.stack(
+        [116 * f[:, 1] - 16, 500 * (f[:, 0] - f[:, 1]), 200 * (f[:, 1] - f[:, 2])], axis=1
+    ).astype(np.float32)
+
+
+class ColorIndex:
+    """Unique hex colours and their coordinates, queried by distance.
+
+    ``space="rgb"`` keeps the Euclidean RGB distance the colour slider has
+    always used (0–441); ``space="lab"`` measures perceptual ΔE76 instead.
+    """
+
+    def __init__(self, hexes: list[str], rgb: np.ndarray, space: str = "rgb"):
+        if space not in ("rgb", "lab"):
+            raise ValueError(f"Unknown colour space: {space}")
+        self.hexes = np.asarray(hexes, dtype=object)
+        self.rgb = rgb
+        self.space = space
+        self._coords = _srgb_to_lab(rgb) if space == "lab" else rgb.astype(np.int32)
+
+    @classmethod
+    def from_series(cls, values: pd.Series, space: str = "rgb") -> "ColorIndex":
+        """Build the index from a column of ``#rrggbb`` strings."""
+        hexes, packed = [], []
+        for h in pd.unique(values.dropna()):
+            match = _HEX_RE.match(str(h).strip())
+            if match is None:
+                continue
+            packed.append(int(match.group(1), 16))
+            hexes.append(h)
+        packed = np.asarray(packed, dtype=np.uint32)
+        rgb = np.stack([(packed >> 16) & 0xFF, (packed >> 8) & 0xFF, packed & 0xFF], axis=1).astype(np.uint8)
+        return cls(hexes, rgb.reshape(-1, 3), space)
+
+    def __len__(self) -> int:
+        return len(self.hexes)
+
+    def within(self, target_hex: str, tolerance: float) -> list[str]:
+        """Return every catalog hex within ``tolerance`` of ``target_hex``."""
+        value = int(target_hex.lstrip("#")[:6], 16)
+        target = np.array([[(value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF]], dtype=np.uint8)
+        if self.space == "lab":
+            diff = self._coords - _srgb_to_lab(target)
+        else:
+            diff = self._coords - target.astype(np.int32)
+        dist2 = np.einsum("ij,ij->i", diff, diff)
+        return self.hexes[dist2 <= tolerance * tolerance].tolist()
@@ -9,3 +9,124 @@ PAGE_SIDEBAR_STATE = "expanded"
 # is useful when deploying to platforms like Heroku.
 QDRANT_COLLECTION = os.getenv("QDRANT_COLLECTION", "Classy_Art")
 
+
+# OpenAI model used for text embeddings.  Changing it invalidates cached vectors.
+TEXT_EMBEDDING_MODEL = os.getenv("TEXT_EMBEDDING_MODEL", "text-embedding-3-large")
+
+# Embedding cache: a small in-process LRU in front of SQLite files shared by
+# every Streamlit worker on the same box.  Set the directory to an empty string
+# to keep the cache in memory only.
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", ".cache/embeddings")
+EMBEDDING_CACHE_MEMORY_SIZE = int(os.getenv("EMBEDDING_CACHE_MEMORY_SIZE", "1024"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+
+# Hugging Face Space (or any Gradio URL) serving the CLIP image encoder.
+CLIP_ENDPOINT = os.getenv("CLIP_ENDPOINT", "elev802/CLIP-Large-Image-Search")
+CLIP_TIMEOUT = float(os.getenv("CLIP_TIMEOUT", "30"))
+
+# Interchangeable CLIP endpoints serving the same model, comma-separated
+# (default: CLIP_ENDPOINT alone, which also names the model in the image
+# cache).  Requests go to the endpoint with the lowest recent latency and get
+# CLIP_TIMEOUT seconds overall.  A request still running after the
+# CLIP_HEDGE_QUANTILE of recent latencies (CLIP_HEDGE_DELAY seconds until
+# there is enough history) is duplicated on the next-best endpoint, and
+# failures are retried elsewhere, up to CLIP_MAX_ATTEMPTS requests in all.
+# After CLIP_BREAKER_FAILURES consecutive failures an endpoint is skipped for
+# CLIP_BREAKER_RESET seconds.
+CLIP_ENDPOINTS = [u.strip() for u in os.getenv("CLIP_ENDPOINTS", CLIP_ENDPOINT).split(",") if u.strip()]
+CLIP_HEDGE_QUANTILE = float(os.getenv("CLIP_HEDGE_QUANTILE", "0.95"))
+CLIP_HEDGE_DELAY = float(os.getenv("CLIP_HEDGE_DELAY", "3"))
+CLIP_MAX_ATTEMPTS = int(os.getenv("CLIP_MAX_ATTEMPTS", "3"))
+CLIP_BREAKER_FAILURES = int(os.getenv("CLIP_BREAKER_FAILURES", "5"))
+CLIP_BREAKER_RESET = float(os.getenv("CLIP_BREAKER_RESET", "30"))
+
+# Colour filter distance: "rgb" (Euclidean, 0-441) or "lab" (CIE76 delta E).
+COLOR_DISTANCE_SPACE = os.getenv("COLOR_DISTANCE_SPACE", "rgb")
+
+# Product catalog.  The Arrow file is built from the CSV with
+# `python -m app.catalog`; the CSV is only read if the Arrow file is missing.
+CATALOG_CSV = os.getenv("CATALOG_CSV", "data/products_05_13.csv")
+CATALOG_ARROW = os.getenv("CATALOG_ARROW", "data/products.arrow")
+
+# Hybrid search embeds the image and the text in parallel; each provider has
+# its own deadline (seconds) and search continues with whatever arrived.
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "8"))
+HYBRID_IMAGE_TIMEOUT = float(os.getenv("HYBRID_IMAGE_TIMEOUT", "20"))
+HYBRID_TEXT_TIMEOUT = float(os.getenv("HYBRID_TEXT_TIMEOUT", "10"))
+
+# Dimensions of the stored vectors, used when creating the collection.
+TEXT_EMBEDDING_DIM = int(os.getenv("TEXT_EMBEDDING_DIM", "3072"))
+IMAGE_EMBEDDING_DIM = int(os.getenv("IMAGE_EMBEDDING_DIM", "768"))
+
+# Search-result cache (per process).  A TTL of 0 disables it.  The collection
+# version stamp written by `python -m app.ingest` is re-checked every
+# QUERY_CACHE_VERSION_CHECK seconds and clears the cache when it changes.
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "300"))
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "512"))
+QUERY_CACHE_VERSION_CHECK = float(os.getenv("QUERY_CACHE_VERSION_CHECK", "30"))
+
+# Text search plan.  "full" queries the full-size "text" vector directly;
+# "rescore" first gathers candidates on a shortened copy of the embedding
+# stored as TEXT_SHORT_VECTOR, then re-ranks them on the full vector.
+# TEXT_SHORT_QUANTIZATION ("none", "scalar" or "binary") applies to the short
+# vector when the collection is created by `python -m app.ingest`.
+TEXT_SEARCH_MODE = os.getenv("TEXT_SEARCH_MODE", "full")
+TEXT_SHORT_VECTOR = os.getenv("TEXT_SHORT_VECTOR", "text_short")
+TEXT_SHORT_DIM = int(os.getenv("TEXT_SHORT_DIM", "256"))
+TEXT_SHORT_QUANTIZATION = os.getenv("TEXT_SHORT_QUANTIZATION", "none")
+TEXT_RESCORE_OVERSAMPLING = float(os.getenv("TEXT_RESCORE_OVERSAMPLING", "4"))
+
+# Batch image search: concurrent CLIP calls and the most queries sent to
+# Qdrant in one query_batch_points request.
+BATCH_IMAGE_WORKERS = int(os.getenv("BATCH_IMAGE_WORKERS", "8"))
+BATCH_QUERY_SIZE = int(os.getenv("BATCH_QUERY_SIZE", "64"))
+
+# Per-stage latency metrics (see app/metrics.py).  Percentiles cover the last
+# METRICS_WINDOW calls of each stage; METRICS_JSONL, if set, receives a JSON
+# snapshot every METRICS_EXPORT_INTERVAL seconds.
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "1000"))
+METRICS_JSONL = os.getenv("METRICS_JSONL")
+METRICS_EXPORT_INTERVAL = float(os.getenv("METRICS_EXPORT_INTERVAL", "60"))
+
+# Per-session search results are kept in a shared store: the query (text,
+# image cache key or point ID) plus the pages fetched so far as catalog row
+# positions + scores.  Entries idle for RESULTS_IDLE_TTL seconds are dropped,
+# and at most RESULTS_MAX_SESSIONS sessions are kept (least recently used
+# first out).
+RESULTS_IDLE_TTL = float(os.getenv("RESULTS_IDLE_TTL", "1800"))
+RESULTS_MAX_SESSIONS = int(os.getenv("RESULTS_MAX_SESSIONS", "2000"))
+
+# Bulk AI enrichment (`python -m app.enrich`): sidecar store read by the
+# Analytics page, chat model, descriptions per request and requests in flight.
+ENRICHMENT_DB = os.getenv("ENRICHMENT_DB", "data/enrichment.sqlite")
+ENRICHMENT_MODEL = os.getenv("ENRICHMENT_MODEL", "gpt-3.5-turbo")
+ENRICHMENT_BATCH_SIZE = int(os.getenv("ENRICHMENT_BATCH_SIZE", "10"))
+ENRICHMENT_CONCURRENCY = int(os.getenv("ENRICHMENT_CONCURRENCY", "8"))
+
+# Near-duplicate detection (`python -m app.dedupe`): clusters browsed on the
+# Admin page, default cosine-similarity thresholds, and the directory for the
+# memory-mapped vector matrices (about N × dim × 4 bytes per vector).
+DUPLICATES_DB = os.getenv("DUPLICATES_DB", "data/duplicates.sqlite")
+DUPLICATES_WORK_DIR = os.getenv("DUPLICATES_WORK_DIR", ".cache/dedupe")
+DUPLICATE_IMAGE_THRESHOLD = float(os.getenv("DUPLICATE_IMAGE_THRESHOLD", "0.97"))
+DUPLICATE_TEXT_THRESHOLD = float(os.getenv("DUPLICATE_TEXT_THRESHOLD", "0.97"))
+
+# Result-card thumbnails: catalog images are downloaded once, shrunk to
+# THUMBNAIL_WIDTH pixels ("jpeg" or "webp" at THUMBNAIL_QUALITY) and kept in
+# an LRU directory of at most THUMBNAIL_CACHE_MB.  THUMBNAIL_WORKERS downloads
+# run at once, each with THUMBNAIL_TIMEOUT seconds.  Drawing a page waits at
+# most THUMBNAIL_PAGE_WAIT seconds for missing thumbnails; cards still missing
+# one show the original URL while it is fetched in the background.  Set the
+# directory to an empty string to show the original image URLs instead.
+THUMBNAIL_CACHE_DIR = os.getenv("THUMBNAIL_CACHE_DIR", ".cache/thumbnails")
+THUMBNAIL_CACHE_MB = float(os.getenv("THUMBNAIL_CACHE_MB", "512"))
+THUMBNAIL_WIDTH = int(os.getenv("THUMBNAIL_WIDTH", "320"))
+THUMBNAIL_FORMAT = os.getenv("THUMBNAIL_FORMAT", "jpeg").lower()
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "80"))
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "8"))
+THUMBNAIL_TIMEOUT = float(os.getenv("THUMBNAIL_TIMEOUT", "5"))
+THUMBNAIL_PAGE_WAIT = float(os.getenv("THUMBNAIL_PAGE_WAIT", "0"))
+
+# Start-up: set WARM_UP=0 to skip opening the Qdrant, OpenAI and CLIP
+# connections in the background when a process starts (see app/startup.py).
+WARM_UP = os.getenv("WARM_UP", "1") != "0"
@@ -1,14 +1,20 @@
+import os
+
 import pandas as pd
-import numpy as np
 import streamlit as st
 
-@st.cache_data
+from app import catalog, config, search_core, startup
+from app.color_index import ColorIndex
+from app.sku_index import SkuIndex
+
+@st.cache_resource
 def load_data():
-    df = pd.read_csv("data/products_05_13.csv")
-    df.replace("NaN", np.nan, inplace=True)
-    return df
+    # Shared across sessions rather than copied per call: the frame is backed
+    # by the memory-mapped Arrow file and is treated as read-only.
+    return catalog.load_catalog()
 
-art_df = load_data()
+with startup.phase("catalog_load"):
+    art_df = load_data()
 
 filter_columns_config = [
     {"label": "Style", "col": "style"},
@@ -28,3 +34,34 @@ def get_filter_options(df, config):
     return opts
 
 filter_options = get_filter_options(art_df, filter_columns_config)
+
+@st.cache_resource
+def load_color_index(space: str) -> ColorIndex:
+    return ColorIndex.from_series(art_df["dominant_color_hex"], space=space)
+
+color_index = load_color_index(config.COLOR_DISTANCE_SPACE)
+
+
+@st.cache_resource
+def load_sku_index() -> SkuIndex:
+    return SkuIndex(art_df["sku"])
+
+sku_index = load_sku_index()
+# Payload hydration in search_core reuses this process's cached catalog.
+search_core.use_catalog(art_df, sku_index)
+
+
+@st.cache_resource
+def _open_store(store_cls: type, path: str):
+    return store_cls(path)
+
+
+def open_store(store_cls: type, path: str):
+    """``store_cls(path)``, shared across sessions, or None while ``path`` does not exist.
+
+    The existence check is not cached, so a store written by a batch job
+    shows up once the job has created it.
+    """
+    if not os.path.exists(path):
+        return None
+    return _open_store(store_cls, path)
@@ -0,0 +1,372 @@
+# app/dedupe.py
+
+"""Catalog-wide near-duplicate detection.
+
+    python -m app.dedupe                                      # image or text similarity >= 0.97
+    python -m app.dedupe --image-threshold 0.95 --text-threshold 0.9 --require all
+    python -m app.dedupe --vectors image text_short --block-size 8192 --workers 8
+    python -m app.dedupe --qdrant-path ./qdrant               # local mode
+
+Vectors are scrolled out of Qdrant into L2-normalised float32 ``.npy``
+memory maps under ``--work-dir``, one row per point.  Similarities are then
+computed block by block.  Each worker multiplies a block of rows by every
+block of columns and keeps only each row's top ``k`` neighbours above the
+threshold.  Each worker reuses one ``block_size²`` float32 buffer for the
+products and picks the top ``k`` a few hundred rows at a time, so memory
+stays at about ``block_size²`` floats (64 MB at the default 4096) per
+worker, plus two ``block_size`` × dim slices of vectors and ``k`` entries
+per item; the N×N matrix is never built.
+Candidate pairs from every vector are rescored on all of them, filtered
+with ``--require``, and joined into clusters (connected components).  The
+clusters are written to ``DUPLICATES_DB``, which the Admin page browses.
+
+The row blocks run on ``--workers`` threads (NumPy releases the GIL).
+NumPy's BLAS may also thread each product, so with many workers set
+``OPENBLAS_NUM_THREADS=1`` (or ``OMP_NUM_THREADS=1``) to avoid
+oversubscription.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app import config
+
+
+def export_vectors(
+    client,
+    collection: str,
+    vector_names: list[str],
+    work_dir: str,
+    batch_size: int = 1000,
+) -> tuple[list, list[str], dict[str, np.ndarray]]:
+    """Scroll every point's vectors into ``{work_dir}/{name}.npy`` memory maps.
+
+    Returns ``(point_ids, skus, matrices)``.  Rows are L2-normalised; a point
+    without a vector gets a zero row, which is similar to nothing.
+    """
+    params = client.get_collection(collection).config.params.vectors
+    n = client.count(collection, exact=True).count
+    os.makedirs(work_dir, exist_ok=True)
+    matrices = {
+        name: np.lib.format.open_memmap(
+            os.path.join(work_dir, f"{name}.npy"), mode="w+", dtype=np.float32, shape=(n, params[name].size)
+        )
+        for name in vector_names
+    }
+    ids, skus = [], []
+    offset = None
+    while len(ids) < n:
+        points, offset = client.scroll(
+            collection, limit=batch_size, offset=offset, with_payload=["sku"], with_vectors=vector_names
+        )
+        points = points[:n - len(ids)]
+        lo = len(ids)
+        for name, matrix in matrices.items():
+            block = np.zeros((len(points), matrix.shape[1]), dtype=np.float32)
+            for i, p in enumerate(points):
+                vec = (p.vector or {}).get(name)
+                if vec:
+                    block[i] = vec
+            norms = np.linalg.norm(block, axis=1, keepdims=True)
+            matrix[lo:lo + len(points)] = np.divide(block, norms, out=block, where=norms > 0)
+        ids.extend(p.id for p in points)
+        skus.extend(str((p.payload or {}).get("sku", "")) for p in points)
+        logging.info(f"Exported {len(ids):,} / {n:,} points")
+        if offset is None:
+            break
+    for matrix in matrices.values():
+        matrix.flush()
+    # Points deleted during the scroll leave unused rows at the end.
+    return ids, skus, {name: m[:len(ids)] for name, m in matrices.items()}
+
+
+# Rows of a similarity block ranked at once when picking the top k.
+_PICK_ROWS = 256
+
+
+def top_neighbours(
+    matrix: np.ndarray,
+    threshold: float,
+    k: int = 10,
+    block_size: int = 4096,
+    workers: int | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """For each row, up to ``k`` other rows with cosine similarity ``>= threshold``.
+
+    ``matrix`` holds L2-normalised rows and may be a memory map.  Returns
+    ``(neighbours, similarities)`` of shape ``(N, k)``, best first; unused
+    slots are ``-1`` / ``-inf``.
+    """
+    n = len(matrix)
+    neighbours = np.full((n, k), -1, dtype=np.int32)
+    similarities = np.full((n, k), -np.inf, dtype=np.float32)
+    blocks = range(0, n, block_size)
+    done = 0
+    lock = threading.Lock()
+
+    def row_block(lo: int) -> None:
+        nonlocal done
+        hi = min(lo + block_size, n)
+        rows = np.ascontiguousarray(matrix[lo:hi])
+        best_s = np.full((hi - lo, k), -np.inf, dtype=np.float32)
+        best_i = np.full((hi - lo, k), -1, dtype=np.int32)
+        # Reused for every column block; a narrower last block uses its head.
+        buf = np.empty((hi - lo) * block_size, dtype=np.float32)
+        for clo in blocks:
+            chi = min(clo + block_size, n)
+            sims = buf[:(hi - lo) * (chi - clo)].reshape(hi - lo, chi - clo)
+            np.matmul(rows, np.ascontiguousarray(matrix[clo:chi]).T, out=sims)
+            if clo < hi and lo < chi:
+                diag = np.arange(max(lo, clo), min(hi, chi))
+                sims[diag - lo, diag - clo] = -np.inf
+            hit = np.flatnonzero(sims.max(axis=1) >= threshold)
+            kk = min(k, chi - clo)
+            # A few rows at a time, so the copy and the (int64) argpartition
+            # result stay small next to the buffer.
+            for start in range(0, len(hit), _PICK_ROWS):
+                rows_hit = hit[start:start + _PICK_ROWS]
+                sub = np.negative(sims[rows_hit])
+                part = np.argpartition(sub, kk - 1, axis=1)[:, :kk]
+                cand_s = np.concatenate([best_s[rows_hit], -np.take_along_axis(sub, part, axis=1)], axis=1)
+                cand_i = np.concatenate([best_i[rows_hit], (part + clo).astype(np.int32)], axis=1)
+                order = np.argsort(-cand_s, axis=1, kind="stable")[:, :k]
+                best_s[rows_hit] = np.take_along_axis(cand_s, order, axis=1)
+                best_i[rows_hit] = np.take_along_axis(cand_i, order, axis=1)
+        below = best_s < threshold
+        best_s[below] = -np.inf
+        best_i[below] = -1
+        neighbours[lo:hi] = best_i
+        similarities[lo:hi] = best_s
+        with lock:
+            done += 1
+            if done % 10 == 0 or done == len(blocks):
+                logging.info(f"Compared {done} / {len(blocks)} row blocks")
+
+    with ThreadPoolExecutor(workers or os.cpu_count() or 1) as pool:
+        list(pool.map(row_block, blocks))
+    return neighbours, similarities
+
+
+def candidate_pairs(neighbour_lists: list[np.ndarray]) -> np.ndarray:
+    """Unique ``(a, b)`` row pairs with ``a < b`` from one or more neighbour arrays."""
+    parts = []
+    for neighbours in neighbour_lists:
+        rows = np.repeat(np.arange(len(neighbours), dtype=np.int32), neighbours.shape[1])
+        cols = neighbours.ravel()
+        keep = cols >= 0
+        rows, cols = rows[keep], cols[keep]
+        parts.append(np.stack([np.minimum(rows, cols), np.maximum(rows, cols)], axis=1))
+    if not parts:
+        return np.empty((0, 2), dtype=np.int32)
+    return np.unique(np.concatenate(parts), axis=0)
+
+
+def pair_similarities(matrix: np.ndarray, pairs: np.ndarray) -> np.ndarray:
+    """Cosine similarity of each row pair, read from ``matrix`` in chunks of ~64 MB."""
+    out = np.empty(len(pairs), dtype=np.float32)
+    chunk = max(1, (1 << 24) // (2 * matrix.shape[1]))
+    for lo in range(0, len(pairs), chunk):
+        a, b = pairs[lo:lo + chunk, 0], pairs[lo:lo + chunk, 1]
+        out[lo:lo + chunk] = np.einsum("ij,ij->i", matrix[a], matrix[b])
+    return out
+
+
+def connected_components(n: int, pairs: np.ndarray) -> np.ndarray:
+    """Component label of each of ``n`` rows, joining every pair (union-find)."""
+    parent = list(range(n))
+
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in pairs.tolist():
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+    return np.array([find(i) for i in range(n)])
+
+
+class DuplicateStore:
+    """Near-duplicate clusters from the latest run, in a SQLite file."""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);"
+            "CREATE TABLE IF NOT EXISTS clusters (id INTEGER PRIMARY KEY, size INTEGER, score REAL);"
+            "CREATE TABLE IF NOT EXISTS members (cluster INTEGER, sku TEXT, point_id TEXT);"
+            "CREATE TABLE IF NOT EXISTS pairs (cluster INTEGER, sku_a TEXT, sku_b TEXT, score REAL, scores TEXT);"
+            "CREATE INDEX IF NOT EXISTS members_cluster ON members (cluster);"
+            "CREATE INDEX IF NOT EXISTS pairs_cluster ON pairs (cluster);"
+        )
+        self._conn.commit()
+
+    def replace(self, clusters: list[dict], run: dict) -> None:
+        """Swap in the results of a run.
+
+        Each cluster is ``{"score", "members": [(sku, point_id)], "pairs":
+        [(sku_a, sku_b, score, {vector: similarity})]}``.
+        """
+        with self._lock, self._conn:
+            for table in ("clusters", "members", "pairs", "meta"):
+                self._conn.execute(f"DELETE FROM {table}")
+            for cid, cluster in enumerate(clusters, start=1):
+                self._conn.execute(
+                    "INSERT INTO clusters VALUES (?, ?, ?)", (cid, len(cluster["members"]), cluster["score"])
+                )
+                self._conn.executemany(
+                    "INSERT INTO members VALUES (?, ?, ?)",
+                    [(cid, sku, str(pid)) for sku, pid in cluster["members"]],
+                )
+                self._conn.executemany(
+                    "INSERT INTO pairs VALUES (?, ?, ?, ?, ?)",
+                    [(cid, a, b, score, json.dumps(scores)) for a, b, score, scores in cluster["pairs"]],
+                )
+            self._conn.execute("INSERT INTO meta VALUES ('run', ?)", (json.dumps(run),))
+
+    def run(self) -> dict | None:
+        """Settings and totals of the run that produced the stored clusters."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'run'").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def clusters(self, min_size: int = 2, limit: int = 1000) -> list[dict]:
+        """Largest, then most similar, clusters first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, size, score FROM clusters WHERE size >= ? ORDER BY size DESC, score DESC LIMIT ?",
+                (min_size, limit),
+            ).fetchall()
+        return [{"cluster": cid, "size": size, "score": score} for cid, size, score in rows]
+
+    def members(self, cluster: int) -> list[str]:
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT sku FROM members WHERE cluster = ?", (cluster,))]
+
+    def pairs(self, cluster: int) -> list[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT sku_a, sku_b, score, scores FROM pairs WHERE cluster = ? ORDER BY score DESC", (cluster,)
+            ).fetchall()
+        return [{"sku_a": a, "sku_b": b, "score": s, **json.loads(scores)} for a, b, s, scores in rows]
+
+
+def find_duplicates(
+    matrices: dict[str, np.ndarray],
+    thresholds: dict[str, float],
+    require: str = "any",
+    k: int = 10,
+    block_size: int = 4096,
+    workers: int | None = None,
+) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """Row pairs that are near-duplicates, and their similarity on every vector.
+
+    With ``require="any"`` a pair needs one vector at or above its threshold;
+    with ``"all"`` it needs every one.
+    """
+    neighbour_lists = []
+    for name, matrix in matrices.items():
+        start = time.perf_counter()
+        neighbours, _ = top_neighbours(matrix, thresholds[name], k, block_size, workers)
+        logging.info(f"{name}: neighbours of {len(matrix):,} rows in {time.perf_counter() - start:.1f}s")
+        neighbour_lists.append(neighbours)
+    pairs = candidate_pairs(neighbour_lists)
+    sims = {name: pair_similarities(m, pairs) for name, m in matrices.items()}
+    passed = np.stack([sims[name] >= thresholds[name] for name in matrices])
+    keep = passed.any(axis=0) if require == "any" else passed.all(axis=0)
+    return pairs[keep], {name: s[keep] for name, s in sims.items()}
+
+
+def build_clusters(
+    ids: list,
+    skus: list[str],
+    pairs: np.ndarray,
+    sims: dict[str, np.ndarray],
+    require: str = "any",
+) -> list[dict]:
+    """Group duplicate pairs into clusters for :meth:`DuplicateStore.replace`.
+
+    A pair's score is its highest similarity for ``require="any"`` and its
+    lowest for ``"all"``; a cluster's score is its best pair's.
+    """
+    if not len(pairs):
+        return []
+    names = list(sims)
+    stacked = np.stack([sims[name] for name in names])
+    scores = stacked.max(axis=0) if require == "any" else stacked.min(axis=0)
+    rows, local = np.unique(pairs, return_inverse=True)
+    labels = connected_components(len(rows), local.reshape(pairs.shape))
+    clusters: dict[int, dict] = {}
+    for row, label in zip(rows, labels):
+        clusters.setdefault(label, {"score": 0.0, "members": [], "pairs": []})["members"].append((skus[row], ids[row]))
+    for (a, b), pair_local, score, pair_sims in zip(pairs, local.reshape(pairs.shape), scores, stacked.T):
+        cluster = clusters[labels[pair_local[0]]]
+        cluster["score"] = max(cluster["score"], float(score))
+        cluster["pairs"].append(
+            (skus[a], skus[b], float(score), {name: float(s) for name, s in zip(names, pair_sims)})
+        )
+    return sorted(clusters.values(), key=lambda c: (-len(c["members"]), -c["score"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collection", default=config.QDRANT_COLLECTION)
+    parser.add_argument("--qdrant-path", default=None, help="Use Qdrant local mode at this path")
+    parser.add_argument("--vectors", nargs="+", default=["image", "text"], help="Named vectors to compare")
+    parser.add_argument("--image-threshold", type=float, default=config.DUPLICATE_IMAGE_THRESHOLD)
+    parser.add_argument("--text-threshold", type=float, default=config.DUPLICATE_TEXT_THRESHOLD,
+                        help="Threshold for every text vector (text, text_short)")
+    parser.add_argument("--require", choices=["any", "all"], default="any",
+                        help="Pairs must pass the threshold on any or on all vectors")
+    parser.add_argument("--top-k", type=int, default=10, help="Neighbours kept per item and vector")
+    parser.add_argument("--block-size", type=int, default=4096, help="Rows per matrix block")
+    parser.add_argument("--workers", type=int, default=None, help="Threads comparing row blocks (default: CPUs)")
+    parser.add_argument("--work-dir", default=config.DUPLICATES_WORK_DIR, help="Where the vector memory maps go")
+    parser.add_argument("--store", default=config.DUPLICATES_DB)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    from qdrant_client import QdrantClient
+    from app.qdrant_utils import QDRANT_API_KEY, QDRANT_URL
+
+    client = QdrantClient(path=args.qdrant_path) if args.qdrant_path else QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
+    thresholds = {
+        name: args.image_threshold if name == "image" else args.text_threshold for name in args.vectors
+    }
+    start = time.perf_counter()
+    ids, skus, matrices = export_vectors(client, args.collection, args.vectors, args.work_dir)
+    exported = time.perf_counter() - start
+    pairs, sims = find_duplicates(matrices, thresholds, args.require, args.top_k, args.block_size, args.workers)
+    clusters = build_clusters(ids, skus, pairs, sims, args.require)
+    run = {
+        "finished": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "collection": args.collection,
+        "items": len(ids),
+        "thresholds": thresholds,
+        "require": args.require,
+        "pairs": int(len(pairs)),
+        "clusters": len(clusters),
+        "export_seconds": round(exported, 1),
+        "total_seconds": round(time.perf_counter() - start, 1),
+    }
+    DuplicateStore(args.store).replace(clusters, run)
+    print(json.dumps(run, indent=2))
+
+
+if __name__ == "__main__":
+    main()
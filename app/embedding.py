@@ -1,29 +1,230 @@
 # embedding.py
+import asyncio
+import hashlib
 import os
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from io import BytesIO
 from PIL import Image
-from openai import OpenAI
 import streamlit as st
-from app.clip_utils import generate_image_embedding
-import tempfile
+from app import config
+from app.clip_utils import HUGGING_FACE_URL, generate_image_embedding_from_bytes
+from app.embedding_cache import EmbeddingCache
+from app.metrics import metrics
+from app.openai_utils import get_async_client, get_client
+
+
+def _cache_path(name: str) -> str | None:
+    if not config.EMBEDDING_CACHE_DIR:
+        return None
+    return os.path.join(config.EMBEDDING_CACHE_DIR, name)
+
+
+text_cache = EmbeddingCache(
+    _cache_path("text.sqlite"),
+    memory_size=config.EMBEDDING_CACHE_MEMORY_SIZE,
+    max_entries=config.EMBEDDING_CACHE_MAX_ENTRIES,
+)
+# Vectors from a previous model are useless (and possibly the wrong size).
+text_cache.retain_only(config.TEXT_EMBEDDING_MODEL)
+
+IMAGE_EMBEDDING_MODEL = f"clip:{HUGGING_FACE_URL}"
+image_cache = EmbeddingCache(
+    _cache_path("image.sqlite"),
+    memory_size=config.EMBEDDING_CACHE_MEMORY_SIZE,
+    max_entries=config.EMBEDDING_CACHE_MAX_ENTRIES,
+)
+image_cache.retain_only(IMAGE_EMBEDDING_MODEL)
+
+
+def normalize_query(text: str) -> str:
+    """Canonical form of a query used as the cache key."""
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+def image_content_key(image: Image.Image) -> str:
+    """Hash of the decoded pixels, so re-uploads of the same picture match."""
+    digest = hashlib.sha256(f"{image.mode}:{image.size}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
 
-# Only initialize the OpenAI client if an API key is available.  Importing this
-# module shouldn't fail just because the environment variable is missing.
-_api_key = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=_api_key) if _api_key else None
 
 def get_image_embedding(image: Image.Image) -> list[float]:
-    with tempfile.NamedTemporaryFile(suffix=".jpg") as tmp:
-        image.save(tmp.name)
-        return generate_image_embedding(tmp.name)
+    key = image_content_key(image)
+    cached = image_cache.get(IMAGE_EMBEDDING_MODEL, key)
+    if cached is not None:
+        return cached
+    buf = BytesIO()
+    image.convert("RGB").save(buf, format="JPEG")
+    embedding = generate_image_embedding_from_bytes(buf.getvalue())
+    image_cache.put(IMAGE_EMBEDDING_MODEL, key, embedding)
+    return embedding
 
-def get_text_embedding(text: str) -> list[float]:
-    model_name = "text-embedding-3-large"
+class EmbeddingUnavailable(RuntimeError):
+    """Raised when an embedding provider is not configured."""
+
+
+def embed_text(text: str) -> list[float]:
+    """Return the text embedding for ``text``; raises on failure.
+
+    ``text`` is embedded as given; its normalised form is only the cache key.
+    """
+    model_name = config.TEXT_EMBEDDING_MODEL
+    key = normalize_query(text)
+    cached = text_cache.get(model_name, key)
+    if cached is not None:
+        return cached
+    client = get_client()
     if client is None:
-        st.error("OPENAI_API_KEY not set; text search is unavailable.")
-        return []
-    try:
+        raise EmbeddingUnavailable("OPENAI_API_KEY not set; text search is unavailable.")
+    with metrics.timed("openai_embedding"):
         response = client.embeddings.create(input=[text], model=model_name)
-        return response.data[0].embedding
+    embedding = response.data[0].embedding
+    text_cache.put(model_name, key, embedding)
+    return embedding
+
+
+def embed_texts(texts: list[str], use_cache: bool = True) -> list[list[float]]:
+    """Embed many texts with one OpenAI request.
+
+    The texts are sent as given.  With ``use_cache`` only the texts missing
+    from the query cache are sent, and their vectors are added to it.  Bulk
+    jobs such as ingestion pass ``False`` so catalog text does not push
+    popular queries out of the cache.
+    """
+    model_name = config.TEXT_EMBEDDING_MODEL
+    if use_cache:
+        vectors = [text_cache.get(model_name, normalize_query(t)) for t in texts]
+    else:
+        vectors = [None] * len(texts)
+    missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+    if missing:
+        client = get_client()
+        if client is None:
+            raise EmbeddingUnavailable("OPENAI_API_KEY not set; text embedding is unavailable.")
+        with metrics.timed("openai_embedding_batch"):
+            response = client.embeddings.create(input=missing, model=model_name)
+        fetched = {t: d.embedding for t, d in zip(missing, sorted(response.data, key=lambda d: d.index))}
+        if use_cache:
+            for t, emb in fetched.items():
+                text_cache.put(model_name, normalize_query(t), emb)
+        vectors = [v if v is not None else fetched[t] for t, v in zip(texts, vectors)]
+    return vectors
+
+
+async def aembed_text(text: str) -> list[float]:
+    """Async counterpart of :func:`embed_text`; shares its cache.
+
+    The cache's SQLite level is read and written off the event loop.
+    """
+    model_name = config.TEXT_EMBEDDING_MODEL
+    key = normalize_query(text)
+    cached = await asyncio.to_thread(text_cache.get, model_name, key)
+    if cached is not None:
+        return cached
+    async_client = get_async_client()
+    if async_client is None:
+        raise EmbeddingUnavailable("OPENAI_API_KEY not set; text search is unavailable.")
+    with metrics.timed("openai_embedding"):
+        response = await async_client.embeddings.create(input=[text], model=model_name)
+    embedding = response.data[0].embedding
+    await asyncio.to_thread(text_cache.put, model_name, key, embedding)
+    return embedding
+
+
+async def aget_image_embedding(image: Image.Image) -> list[float]:
+    """Async wrapper around :func:`get_image_embedding`.
+
+    The Gradio client is blocking, so the CLIP call runs on the embedding
+    thread pool.
+    """
+    return await asyncio.get_running_loop().run_in_executor(_executor, get_image_embedding, image)
+
+
+def get_text_embedding(text: str) -> list[float]:
+    try:
+        return embed_text(text)
+    except EmbeddingUnavailable as e:
+        st.error(str(e))
+        return []
     except Exception as e:
         st.error(f"Error fetching embedding from OpenAI: {e}")
         return []
+
+
+_executor = ThreadPoolExecutor(max_workers=config.EMBEDDING_WORKERS, thread_name_prefix="embed")
+
+
+# "embed_image"/"embed_text" time the provider call including cache hits;
+# timeouts are counted by the caller that gave up waiting.
+def _timed(stage: str, fn, *args):
+    with metrics.timed(stage):
+        return fn(*args)
+
+
+async def _atimed(stage: str, coro):
+    with metrics.timed(stage):
+        return await coro
+
+
+def get_hybrid_embeddings(
+    image: Image.Image | None = None,
+    text: str | None = None,
+) -> tuple[dict[str, list[float]], dict[str, str]]:
+    """Embed the image and the text concurrently.
+
+    Each provider gets its own timeout (``HYBRID_IMAGE_TIMEOUT`` /
+    ``HYBRID_TEXT_TIMEOUT``).  Returns ``(vectors, errors)``: ``vectors`` maps
+    "image"/"text" to whichever embeddings arrived in time and ``errors`` maps
+    the failed providers to a message, so callers can search on a partial set.
+    A provider that times out keeps running in the background and still fills
+    the embedding cache for the next query.
+    """
+    start = time.monotonic()
+    futures = {}
+    if image is not None:
+        futures["image"] = (_executor.submit(_timed, "embed_image", get_image_embedding, image), config.HYBRID_IMAGE_TIMEOUT)
+    if text:
+        futures["text"] = (_executor.submit(_timed, "embed_text", embed_text, text), config.HYBRID_TEXT_TIMEOUT)
+
+    vectors: dict[str, list[float]] = {}
+    errors: dict[str, str] = {}
+    for name, (future, timeout) in futures.items():
+        remaining = max(0.0, start + timeout - time.monotonic())
+        try:
+            vectors[name] = future.result(timeout=remaining)
+        except FutureTimeout:
+            errors[name] = f"timed out after {timeout:g}s"
+            metrics.error(f"embed_{name}", timeout=True)
+        except Exception as e:
+            errors[name] = str(e)
+    return vectors, errors
+
+
+async def aget_hybrid_embeddings(
+    image: Image.Image | None = None,
+    text: str | None = None,
+) -> tuple[dict[str, list[float]], dict[str, str]]:
+    """Async counterpart of :func:`get_hybrid_embeddings`, with the same timeouts."""
+    tasks = {}
+    if image is not None:
+        tasks["image"] = (asyncio.ensure_future(_atimed("embed_image", aget_image_embedding(image))), config.HYBRID_IMAGE_TIMEOUT)
+    if text:
+        tasks["text"] = (asyncio.ensure_future(_atimed("embed_text", aembed_text(text))), config.HYBRID_TEXT_TIMEOUT)
+
+    start = time.monotonic()
+    vectors: dict[str, list[float]] = {}
+    errors: dict[str, str] = {}
+    for name, (task, timeout) in tasks.items():
+        remaining = max(0.0, start + timeout - time.monotonic())
+        try:
+            # Shielded so a slow provider still finishes and fills the cache.
+            vectors[name] = await asyncio.wait_for(asyncio.shield(task), remaining)
+        except asyncio.TimeoutError:
+            errors[name] = f"timed out after {timeout:g}s"
+            metrics.error(f"embed_{name}", timeout=True)
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        except Exception as e:
+            errors[name] = str(e)
+    return vectors, errors
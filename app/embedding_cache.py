@@ -0,0 +1,168 @@
+# app/embedding_cache.py
+
+"""Two-level (in-process LRU + shared SQLite) cache for embedding vectors."""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """Cache embedding vectors keyed on ``(model, key)``.
+
+    Lookups hit a per-process LRU first and then a SQLite file that every
+    Streamlit worker on the box opens, so a vector computed by one process is
+    reused by all of them.  Vectors are stored as raw float32 blobs.
+    """
+
+    def __init__(self, path: str | None, memory_size: int = 1024, max_entries: int = 100_000):
+        self.path = path
+        self.memory_size = memory_size
+        self.max_entries = max_entries
+        # Immutable, so a caller changing a returned vector cannot corrupt the cache.
+        self._memory: OrderedDict[tuple[str, str], tuple[float, ...]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        if path:
+            try:
+                self._conn = self._connect(path)
+            except sqlite3.Error as e:
+                logging.error(f"Embedding cache disabled on disk ({path}): {e}")
+                self._conn = None
+
+    @staticmethod
+    def _connect(path: str) -> sqlite3.Connection:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " PRIMARY KEY (model, key))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        return conn
+
+    def get(self, model: str, key: str) -> list[float] | None:
+        """Return a copy of the cached vector for ``(model, key)`` or ``None``."""
+        mem_key = (model, key)
+        with self._lock:
+            vector = self._memory.get(mem_key)
+            if vector is not None:
+                self._memory.move_to_end(mem_key)
+                self.hits_memory += 1
+                return list(vector)
+            if self._conn is not None:
+                try:
+                    row = self._conn.execute(
+                        "SELECT vector FROM embeddings WHERE model = ? AND key = ?", (model, key)
+                    ).fetchone()
+                    if row is not None:
+                        self._conn.execute(
+                            "UPDATE embeddings SET last_used = ? WHERE model = ? AND key = ?",
+                            (time.time(), model, key),
+                        )
+                except sqlite3.Error as e:
+                    logging.warning(f"Embedding cache read failed: {e}")
+                    row = None
+                if row is not None:
+                    vector = np.frombuffer(row[0], dtype=np.float32).tolist()
+                    self._remember(mem_key, tuple(vector))
+                    self.hits_disk += 1
+                    return vector
+            self.misses += 1
+            return None
+
+    def put(self, model: str, key: str, vector: list[float]) -> None:
+        """Store ``vector`` in both cache levels, evicting the oldest entries."""
+        if not vector:
+            return
+        mem_key = (model, key)
+        with self._lock:
+            self._remember(mem_key, tuple(vector))
+            if self._conn is None:
+                return
+            blob = np.asarray(vector, dtype=np.float32).tobytes()
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO embeddings (model, key, vector, last_used) VALUES (?, ?, ?, ?)",
+                    (model, key, blob, time.time()),
+                )
+                (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+                if count > self.max_entries:
+                    self._conn.execute(
+                        "DELETE FROM embeddings WHERE rowid IN"
+                        " (SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                        (count - self.max_entries,),
+                    )
+            except sqlite3.Error as e:
+                logging.warning(f"Embedding cache write failed: {e}")
+
+    def invalidate(self, model: str | None = None) -> None:
+        """Drop cached vectors for ``model``, or for every model if ``None``."""
+        with self._lock:
+            if model is None:
+                self._memory.clear()
+            else:
+                for mem_key in [k for k in self._memory if k[0] == model]:
+                    del self._memory[mem_key]
+            if self._conn is None:
+                return
+            try:
+                if model is None:
+                    self._conn.execute("DELETE FROM embeddings")
+                else:
+                    self._conn.execute("DELETE FROM embeddings WHERE model = ?", (model,))
+            except sqlite3.Error as e:
+                logging.warning(f"Embedding cache invalidation failed: {e}")
+
+    def retain_only(self, model: str) -> None:
+        """Drop vectors of every model except ``model`` (call after a model switch)."""
+        with self._lock:
+            for mem_key in [k for k in self._memory if k[0] != model]:
+                del self._memory[mem_key]
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute("DELETE FROM embeddings WHERE model != ?", (model,))
+            except sqlite3.Error as e:
+                logging.warning(f"Embedding cache invalidation failed: {e}")
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current sizes."""
+        with self._lock:
+            lookups = self.hits_memory + self.hits_disk + self.misses
+            disk_entries = None
+            if self._conn is not None:
+                try:
+                    (disk_entries,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+                except sqlite3.Error:
+                    disk_entries = None
+            return {
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "hit_rate": (self.hits_memory + self.hits_disk) / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+            }
+
+    def _remember(self, mem_key: tuple[str, str], vector: tuple[float, ...]) -> None:
+        self._memory[mem_key] = vector
+        self._memory.move_to_end(mem_key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
@@ -0,0 +1,290 @@
+# app/endpoint_pool.py
+
+"""Resilient calls to a set of interchangeable remote endpoints.
+
+:class:`EndpointPool` sends each call to the endpoint with the lowest
+expected latency.  If the call is still running after a high percentile
+of recent latencies, it sends a duplicate ("hedged") request to the next
+best endpoint and returns whichever answers first.  A failed attempt is
+retried on another endpoint straight away.  Every call has an overall
+deadline.  Each endpoint has a :class:`CircuitBreaker`: after repeated
+failures it is skipped without being called, and it gets a single trial
+request once its cool-down has passed.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable
+
+import numpy as np
+
+
+class EndpointsUnavailable(RuntimeError):
+    """Raised without calling anything when every endpoint's circuit is open."""
+
+
+class CircuitBreaker:
+    """Closed → open after ``failure_threshold`` consecutive failures.
+
+    An open breaker rejects calls for ``reset_after`` seconds.  Then it
+    becomes half-open and lets one trial call through.  Success closes it;
+    failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_after: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.state = "closed"
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead; in the half-open state this claims the trial call."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_after:
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def available(self) -> bool:
+        """Like :meth:`allow`, but without claiming anything."""
+        with self._lock:
+            if self.state == "open":
+                return time.monotonic() - self._opened_at >= self.reset_after
+            return self.state == "closed" or not self._probing
+
+    def success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+
+    def failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.opened += 1
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+class Endpoint:
+    """One remote endpoint: its breaker, recent latencies and requests in flight."""
+
+    def __init__(self, url: str, breaker: CircuitBreaker, window: int = 200):
+        self.url = url
+        self.breaker = breaker
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.ewma: float | None = None
+        self.inflight = 0
+        self.requests = 0
+        self.failures = 0
+        self.client: Any = None  # transport state, owned by the pool's call function
+        self._lock = threading.Lock()
+
+    def score(self) -> float:
+        """Expected wait: smoothed latency scaled by the requests already in flight.
+
+        Endpoints with no history score 0, so new ones get tried.
+        """
+        return (self.ewma or 0.0) * (1 + self.inflight)
+
+    def _start(self) -> None:
+        with self._lock:
+            self.inflight += 1
+            self.requests += 1
+
+    def _finish(self, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self.inflight -= 1
+            if ok:
+                self.latencies.append(seconds)
+                self.ewma = seconds if self.ewma is None else 0.8 * self.ewma + 0.2 * seconds
+            else:
+                self.failures += 1
+                # A failure counts as slow, so routing drifts away from it.
+                self.ewma = seconds if self.ewma is None else max(self.ewma, seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            recent = np.fromiter(self.latencies, float)
+            inflight, requests, failures, ewma = self.inflight, self.requests, self.failures, self.ewma
+        p50, p95 = (np.percentile(recent, [50, 95]) * 1000).tolist() if len(recent) else (None, None)
+        return {
+            "url": self.url,
+            "circuit": self.breaker.state,
+            "circuit_opened": self.breaker.opened,
+            "requests": requests,
+            "failures": failures,
+            "inflight": inflight,
+            "ewma_ms": ewma * 1000 if ewma is not None else None,
+            "p50_ms": p50,
+            "p95_ms": p95,
+        }
+
+
+class EndpointPool:
+    """Latency-aware routing, hedging, retries and circuit breaking over ``urls``.
+
+    ``call(endpoint, *args, timeout=seconds)`` performs one attempt against
+    one endpoint and must give up after ``timeout`` seconds.  It may keep
+    per-endpoint state (e.g. a client) in ``endpoint.client``.
+    """
+
+    def __init__(
+        self,
+        urls: list[str],
+        call: Callable[..., Any],
+        timeout: float = 30.0,
+        hedge_quantile: float = 0.95,
+        hedge_delay: float = 2.0,
+        min_samples: int = 20,
+        max_attempts: int = 3,
+        failure_threshold: int = 5,
+        reset_after: float = 30.0,
+        explore: float = 0.05,
+        workers: int = 16,
+    ):
+        if not urls:
+            raise ValueError("EndpointPool needs at least one endpoint")
+        self.endpoints = [Endpoint(u, CircuitBreaker(failure_threshold, reset_after)) for u in urls]
+        self._call = call
+        self.timeout = timeout
+        self.hedge_quantile = hedge_quantile
+        self.hedge_delay = hedge_delay
+        self.min_samples = min_samples
+        self.max_attempts = max_attempts
+        self.explore = explore
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="endpoint")
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedges = 0
+        self.retries = 0
+        self.backup_wins = 0
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def current_hedge_delay(self) -> float:
+        """Seconds to wait before hedging: the ``hedge_quantile`` of recent latencies."""
+        recent = [s for ep in self.endpoints for s in list(ep.latencies)]
+        if len(recent) < self.min_samples:
+            return self.hedge_delay
+        return float(np.quantile(recent, self.hedge_quantile))
+
+    def _pick(self, busy: set[int]) -> Endpoint | None:
+        """Claim the best available endpoint, preferring ones not already in this call."""
+        candidates = [ep for ep in self.endpoints if ep.breaker.available()]
+        fresh = [ep for ep in candidates if id(ep) not in busy]
+        candidates = fresh or candidates
+        if len(candidates) > 1 and random.random() < self.explore:
+            random.shuffle(candidates)
+        else:
+            candidates.sort(key=Endpoint.score)
+        for ep in candidates:
+            if ep.breaker.allow():
+                return ep
+        return None
+
+    def _attempt(self, ep: Endpoint, args: tuple, deadline: float) -> Any:
+        ep._start()
+        start = time.monotonic()
+        ok = False
+        try:
+            result = self._call(ep, *args, timeout=max(0.0, deadline - start))
+            ok = True
+            return result
+        finally:
+            ep._finish(time.monotonic() - start, ok)
+            if ok:
+                ep.breaker.success()
+            else:
+                ep.breaker.failure()
+
+    def call(self, *args) -> Any:
+        """Run one call with hedging and retries; raises the last error or ``TimeoutError``."""
+        self._count("calls")
+        deadline = time.monotonic() + self.timeout
+        pending: dict[Future, int] = {}
+        busy: dict[Future, Endpoint] = {}
+        attempts = 0
+        last_error: BaseException | None = None
+
+        def launch() -> bool:
+            nonlocal attempts
+            ep = self._pick({id(busy[f]) for f in pending})
+            if ep is None:
+                return False
+            attempts += 1
+            future = self._executor.submit(self._attempt, ep, args, deadline)
+            pending[future] = attempts
+            busy[future] = ep
+            return True
+
+        if not launch():
+            raise EndpointsUnavailable(
+                f"all {len(self.endpoints)} endpoint(s) failing; retrying in up to "
+                f"{self.endpoints[0].breaker.reset_after:g}s"
+            )
+        hedge_at = time.monotonic() + self.current_hedge_delay()
+        while pending:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            can_launch = attempts < self.max_attempts
+            wake = min(deadline, hedge_at) if can_launch else deadline
+            done, _ = wait(list(pending), timeout=max(0.0, wake - now), return_when=FIRST_COMPLETED)
+            failed = False
+            for future in done:
+                attempt = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    failed = True
+                    continue
+                if attempt > 1:
+                    self._count("backup_wins")
+                return result
+            if not can_launch:
+                continue
+            if failed and launch():
+                self._count("retries")
+            elif not done and time.monotonic() >= hedge_at:
+                if launch():
+                    self._count("hedges")
+                # Also when nothing could be launched (every circuit open, or
+                # this endpoint's half-open trial is the call in flight), so
+                # the next wait does not return immediately in a busy loop.
+                hedge_at = time.monotonic() + self.current_hedge_delay()
+        if pending:
+            # Stragglers finish on their own (their own timeout bounds them)
+            # and still feed the latency stats and breakers.
+            raise TimeoutError(f"no endpoint answered within {self.timeout:g}s")
+        if last_error is None:
+            raise EndpointsUnavailable("no endpoint available for a retry")
+        raise last_error
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "backup_wins": self.backup_wins,
+            "retries": self.retries,
+            "hedge_delay_ms": self.current_hedge_delay() * 1000,
+            "endpoints": [ep.stats() for ep in self.endpoints],
+        }
@@ -0,0 +1,304 @@
+# app/enrich.py
+
+"""Bulk AI enrichment: a one-sentence summary and tags for every description.
+
+    python -m app.enrich                          # OPENAI_API_KEY against api.openai.com
+    python -m app.enrich --concurrency 16 --batch-size 20
+    python -m app.enrich --base-url http://127.0.0.1:8089/v1 --api-key test   # e.g. benchmarks.openai_stub
+
+Results go to a sidecar SQLite store (``ENRICHMENT_DB``) keyed on a hash of
+the description text.  Each finished request is committed immediately, so a
+rerun (or a resumed, interrupted run) only sends descriptions that are new,
+changed, or were enriched with another model or prompt version.  Several
+descriptions are sent per chat request.  Requests run with bounded
+concurrency, and rate limits and transient errors are retried with
+backoff.  The Analytics page reads the store; it never calls OpenAI itself.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING
+
+from app import config
+from app.metrics import metrics
+from app.startup import LazyModule
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+# The Analytics page imports the store from here; only the job needs openai.
+openai = LazyModule("openai")
+
+# Bump when the prompt or output format changes so existing entries are redone.
+PROMPT_VERSION = "1"
+
+SYSTEM_PROMPT = (
+    "You write catalog copy for an art retailer. For each product description you receive, "
+    "write a one-sentence summary and up to five short descriptive tags. "
+    'Reply with a JSON object {"items": [{"id": ..., "summary": "...", "tags": ["...", ...]}]} '
+    "containing exactly one item per input id."
+)
+
+
+def description_hash(text: str) -> str:
+    """Key of a description in the store; insensitive to whitespace changes."""
+    return hashlib.sha256(" ".join(str(text).split()).encode()).hexdigest()
+
+
+class EnrichmentStore:
+    """Summaries and tags keyed on description hash, in a SQLite file."""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS enrichment ("
+            " hash TEXT PRIMARY KEY, summary TEXT, tags TEXT, model TEXT, version TEXT, updated REAL)"
+        )
+        self._conn.commit()
+
+    def get(self, text: str) -> dict | None:
+        """``{"summary", "tags"}`` for a description, or ``None`` if not enriched."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, tags FROM enrichment WHERE hash = ?", (description_hash(text),)
+            ).fetchone()
+        return {"summary": row[0], "tags": json.loads(row[1])} if row else None
+
+    def current(self, hashes: list[str], model: str) -> set[str]:
+        """The subset of ``hashes`` already enriched with ``model`` and this prompt version."""
+        done = set()
+        with self._lock:
+            for i in range(0, len(hashes), 500):
+                part = hashes[i:i + 500]
+                done.update(r[0] for r in self._conn.execute(
+                    f"SELECT hash FROM enrichment WHERE model = ? AND version = ? AND hash IN ({','.join('?' * len(part))})",
+                    [model, PROMPT_VERSION, *part],
+                ))
+        return done
+
+    def save(self, entries: list[tuple[str, str, list[str]]], model: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO enrichment VALUES (?, ?, ?, ?, ?, ?)",
+                [(h, summary, json.dumps(tags), model, PROMPT_VERSION, now) for h, summary, tags in entries],
+            )
+            self._conn.commit()
+
+    def prune(self, keep: set[str]) -> int:
+        """Delete entries whose description is no longer in ``keep``."""
+        with self._lock:
+            stale = [(h,) for (h,) in self._conn.execute("SELECT hash FROM enrichment") if h not in keep]
+            self._conn.executemany("DELETE FROM enrichment WHERE hash = ?", stale)
+            self._conn.commit()
+        return len(stale)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM enrichment").fetchone()[0]
+
+
+@dataclass
+class EnrichStats:
+    descriptions: int = 0
+    already_done: int = 0
+    enriched: int = 0
+    failed: int = 0
+    requests: int = 0
+    retries: int = 0
+    pruned: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def _parse_items(content: str, ids: list[str]) -> dict[str, tuple[str, list[str]]]:
+    """Valid ``id → (summary, tags)`` pairs from a model reply; anything malformed is dropped."""
+    try:
+        items = json.loads(content).get("items", [])
+    except (json.JSONDecodeError, AttributeError):
+        return {}
+    out = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict) or str(item.get("id")) not in ids:
+            continue
+        summary = item.get("summary")
+        tags = item.get("tags")
+        if isinstance(tags, str):
+            tags = tags.split(",")
+        if isinstance(summary, str) and summary.strip() and isinstance(tags, list):
+            out[str(item["id"])] = (summary.strip(), [str(t).strip() for t in tags if str(t).strip()][:5])
+    return out
+
+
+class Enricher:
+    """Enrich descriptions with bounded concurrency, saving as results arrive."""
+
+    def __init__(
+        self,
+        client: AsyncOpenAI,
+        store: EnrichmentStore,
+        model: str = config.ENRICHMENT_MODEL,
+        batch_size: int = config.ENRICHMENT_BATCH_SIZE,
+        concurrency: int = config.ENRICHMENT_CONCURRENCY,
+        max_retries: int = 6,
+    ):
+        self.client = client
+        self.store = store
+        self.model = model
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.stats = EnrichStats()
+        self.retryable = (
+            openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError,
+        )
+        # After a 429 every worker waits until this time, not just the one that hit it.
+        self._resume_at = 0.0
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        retry_after = None
+        response = getattr(error, "response", None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get("retry-after"))
+            except (TypeError, ValueError):
+                pass
+        delay = retry_after if retry_after is not None else min(60.0, 2 ** attempt) * (0.5 + random.random())
+        if isinstance(error, openai.RateLimitError):
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+        return delay
+
+    async def _complete(self, batch: list[tuple[str, str]]) -> str:
+        ids = [str(i) for i in range(len(batch))]
+        payload = json.dumps({"products": [{"id": i, "description": text} for i, (_, text) in zip(ids, batch)]})
+        for attempt in range(self.max_retries + 1):
+            wait = self._resume_at - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self.stats.requests += 1
+            try:
+                with metrics.timed("openai_enrichment"):
+                    resp = await self.client.chat.completions.create(
+                        model=self.model,
+                        messages=[{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": payload}],
+                        response_format={"type": "json_object"},
+                    )
+                return resp.choices[0].message.content or ""
+            except self.retryable as e:
+                if attempt == self.max_retries:
+                    raise
+                self.stats.retries += 1
+                delay = self._backoff(attempt, e)
+                logging.info(f"Enrichment request failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            batch = await queue.get()
+            try:
+                try:
+                    content = await self._complete(batch)
+                except Exception as e:
+                    logging.warning(f"Enrichment of {len(batch)} descriptions failed: {e}")
+                    self.stats.failed += len(batch)
+                    continue
+                parsed = _parse_items(content, [str(i) for i in range(len(batch))])
+                done = [(h, *parsed[str(i)]) for i, (h, _) in enumerate(batch) if str(i) in parsed]
+                if done:
+                    self.store.save(done, self.model)
+                    self.stats.enriched += len(done)
+                missing = [item for i, item in enumerate(batch) if str(i) not in parsed]
+                if len(batch) > 1:
+                    # The model skipped or garbled some items; retry them one at a time.
+                    for item in missing:
+                        queue.put_nowait([item])
+                else:
+                    self.stats.failed += len(missing)
+            finally:
+                queue.task_done()
+
+    async def run(self, descriptions: Iterable[str], prune: bool = False) -> EnrichStats:
+        by_hash = {}
+        for text in descriptions:
+            if isinstance(text, str) and text.strip():
+                by_hash.setdefault(description_hash(text), text)
+        self.stats.descriptions = len(by_hash)
+        done = self.store.current(list(by_hash), self.model)
+        self.stats.already_done = len(done)
+        if prune:
+            self.stats.pruned = self.store.prune(set(by_hash))
+        todo = [(h, text) for h, text in by_hash.items() if h not in done]
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for i in range(0, len(todo), self.batch_size):
+            queue.put_nowait(todo[i:i + self.batch_size])
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(self.concurrency)]
+        try:
+            await queue.join()
+        finally:
+            for w in workers:
+                w.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        return self.stats
+
+
+def catalog_descriptions(path: str) -> list[str]:
+    from app.catalog import read_catalog, read_catalog_csv
+    df = read_catalog(path) if path.endswith(".arrow") else read_catalog_csv(path)
+    return df["description"].dropna().tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default=None, help="Catalog .arrow or .csv (default: Arrow file if built, else CSV)")
+    parser.add_argument("--store", default=config.ENRICHMENT_DB)
+    parser.add_argument("--model", default=config.ENRICHMENT_MODEL)
+    parser.add_argument("--batch-size", type=int, default=config.ENRICHMENT_BATCH_SIZE, help="Descriptions per request")
+    parser.add_argument("--concurrency", type=int, default=config.ENRICHMENT_CONCURRENCY, help="Requests in flight")
+    parser.add_argument("--max-retries", type=int, default=6)
+    parser.add_argument("--base-url", default=None, help="OpenAI-compatible endpoint (default: OPENAI_BASE_URL or api.openai.com)")
+    parser.add_argument("--api-key", default=None, help="Default: OPENAI_API_KEY")
+    parser.add_argument("--prune", action="store_true", help="Delete entries for descriptions no longer in the catalog")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    source = args.source or (config.CATALOG_ARROW if os.path.exists(config.CATALOG_ARROW) else config.CATALOG_CSV)
+    client = openai.AsyncOpenAI(
+        api_key=args.api_key or os.getenv("OPENAI_API_KEY"),
+        base_url=args.base_url,
+        # Retries are handled by the Enricher so all workers can share the backoff.
+        max_retries=0,
+    )
+    enricher = Enricher(
+        client,
+        EnrichmentStore(args.store),
+        model=args.model,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        max_retries=args.max_retries,
+    )
+    stats = asyncio.run(enricher.run(catalog_descriptions(source), prune=args.prune))
+    print(json.dumps(stats.as_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
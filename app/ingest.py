@@ -0,0 +1,449 @@
+# app/ingest.py
+
+"""Incremental, resumable ingestion of the catalog into Qdrant.
+
+Rows are streamed in chunks, their text and image are embedded in
+concurrent batches and the points are upserted in parallel with bounded
+in-flight uploads.  A SQLite checkpoint stores a fingerprint of each row's
+text, image and payload, so a re-run only re-embeds what changed and an
+interrupted run resumes where it stopped.
+
+    python -m app.ingest                          # QDRANT_URL / QDRANT_API_KEY
+    python -m app.ingest --qdrant-path ./qdrant   # local mode
+    python -m app.ingest --prune                  # also delete removed SKUs
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from dataclasses import dataclass, field
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qmodels
+
+from app import config
+from app.qdrant_utils import shorten_vector
+
+# Text that is embedded for each row, in this order.
+TEXT_FIELDS = ["product_name", "description", "style", "category", "class", "occasion"]
+# Payload fields that get a keyword index (the sidebar filters).
+INDEXED_FIELDS = ["sku", "style", "category", "class", "occasion", "orientation", "dominant_color_hex", "country_of_origin"]
+
+TextEmbedder = Callable[[list[str]], list[list[float]]]
+ImageEmbedder = Callable[[str], list[float] | None]
+
+
+def point_id(sku: str) -> str:
+    """Stable Qdrant point ID for a SKU."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"classy-ris:sku:{sku}"))
+
+
+def _fingerprint(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def row_text(row: dict) -> str:
+    return "\n".join(str(row[f]) for f in TEXT_FIELDS if row.get(f) is not None)
+
+
+def row_payload(row: dict) -> dict:
+    """JSON-safe payload with missing values dropped."""
+    payload = {}
+    for k, v in row.items():
+        if v is None or (isinstance(v, float) and math.isnan(v)) or v is pd.NA:
+            continue
+        payload[k] = v.item() if isinstance(v, np.generic) else v
+    return payload
+
+
+def iter_catalog(path: str, chunk_size: int) -> Iterator[list[dict]]:
+    """Yield the catalog as lists of row dicts without loading it whole."""
+    if path.endswith(".arrow"):
+        reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            for offset in range(0, batch.num_rows, chunk_size):
+                yield batch.slice(offset, chunk_size).to_pylist()
+    else:
+        for chunk in pd.read_csv(path, chunksize=chunk_size, dtype={"sku": str}):
+            chunk = chunk.replace("NaN", np.nan)
+            yield [row_payload(r) for r in chunk.to_dict("records")]
+
+
+class Checkpoint:
+    """Per-SKU fingerprints of what is already in the collection."""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rows ("
+            " sku TEXT PRIMARY KEY, text_fp TEXT, image_fp TEXT, payload_fp TEXT)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+
+    def get_many(self, skus: list[str]) -> dict[str, tuple[str, str, str]]:
+        with self._lock:
+            out = {}
+            for i in range(0, len(skus), 500):
+                part = skus[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT sku, text_fp, image_fp, payload_fp FROM rows WHERE sku IN ({','.join('?' * len(part))})",
+                    part,
+                ).fetchall()
+                out.update({r[0]: r[1:] for r in rows})
+            return out
+
+    def save(self, entries: list[tuple[str, str, str, str]]) -> None:
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO rows VALUES (?, ?, ?, ?)", entries)
+            self._conn.commit()
+
+    def delete(self, skus: list[str]) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM rows WHERE sku = ?", [(s,) for s in skus])
+            self._conn.commit()
+
+    def all_skus(self) -> set[str]:
+        with self._lock:
+            return {r[0] for r in self._conn.execute("SELECT sku FROM rows")}
+
+    def get_meta(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+            return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+            self._conn.commit()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM rows")
+            self._conn.commit()
+
+
+@dataclass
+class IngestStats:
+    rows: int = 0
+    unchanged: int = 0
+    upserted: int = 0
+    payload_only: int = 0
+    text_embedded: int = 0
+    image_embedded: int = 0
+    image_failed: int = 0
+    deleted: int = 0
+    seconds: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, **counts) -> None:
+        with self._lock:
+            for k, v in counts.items():
+                setattr(self, k, getattr(self, k) + v)
+
+    def as_dict(self) -> dict:
+        return {k: v for k, v in self.__dict__.items() if not k.startswith("_")}
+
+
+def _short_text_quantization():
+    mode = config.TEXT_SHORT_QUANTIZATION
+    if mode == "scalar":
+        return qmodels.ScalarQuantization(
+            scalar=qmodels.ScalarQuantizationConfig(type=qmodels.ScalarType.INT8, always_ram=True)
+        )
+    if mode == "binary":
+        return qmodels.BinaryQuantization(binary=qmodels.BinaryQuantizationConfig(always_ram=True))
+    if mode != "none":
+        raise ValueError(f"Unknown TEXT_SHORT_QUANTIZATION: {mode}")
+    return None
+
+
+def ensure_collection(client: QdrantClient, collection: str) -> None:
+    """Create the collection with named "image"/"text"/short-text vectors if missing.
+
+    In "rescore" mode the full text vectors are only read to re-rank
+    candidates, so they are kept on disk.
+    """
+    if client.collection_exists(collection):
+        return
+    client.create_collection(
+        collection_name=collection,
+        vectors_config={
+            "image": qmodels.VectorParams(size=config.IMAGE_EMBEDDING_DIM, distance=qmodels.Distance.COSINE),
+            "text": qmodels.VectorParams(
+                size=config.TEXT_EMBEDDING_DIM,
+                distance=qmodels.Distance.COSINE,
+                on_disk=config.TEXT_SEARCH_MODE == "rescore",
+            ),
+            config.TEXT_SHORT_VECTOR: qmodels.VectorParams(
+                size=config.TEXT_SHORT_DIM,
+                distance=qmodels.Distance.COSINE,
+                quantization_config=_short_text_quantization(),
+            ),
+        },
+    )
+    for name in INDEXED_FIELDS:
+        client.create_payload_index(collection, field_name=name, field_schema=qmodels.PayloadSchemaType.KEYWORD)
+
+
+def bump_collection_version(client: QdrantClient, collection: str) -> str:
+    """Stamp the collection with a new version so app result caches drop stale entries."""
+    version = uuid.uuid4().hex
+    client.update_collection(collection, metadata={"version": version})
+    return version
+
+
+class Ingestor:
+    """Embed changed catalog rows and upsert them into a Qdrant collection."""
+
+    def __init__(
+        self,
+        client: QdrantClient,
+        checkpoint: Checkpoint,
+        embed_texts: TextEmbedder,
+        embed_image: ImageEmbedder,
+        collection: str = config.QDRANT_COLLECTION,
+        text_batch_size: int = 64,
+        image_workers: int = 8,
+        upload_workers: int = 4,
+        max_inflight: int = 8,
+    ):
+        self.client = client
+        self.checkpoint = checkpoint
+        self.embed_texts = embed_texts
+        self.embed_image = embed_image
+        self.collection = collection
+        self.text_batch_size = text_batch_size
+        self.stats = IngestStats()
+        # Collections created before short text vectors existed lack the slot.
+        vector_names = client.get_collection(collection).config.params.vectors
+        self._store_short = isinstance(vector_names, dict) and config.TEXT_SHORT_VECTOR in vector_names
+        self._embed_pool = ThreadPoolExecutor(max_workers=max(image_workers, 1) + 2, thread_name_prefix="ingest-embed")
+        self._upload_pool = ThreadPoolExecutor(max_workers=upload_workers, thread_name_prefix="ingest-upload")
+        # Backpressure: embedding stops when this many batches await upload.
+        self._inflight = threading.BoundedSemaphore(max_inflight)
+        self._errors: list[BaseException] = []
+
+    def run(self, rows: Iterator[list[dict]], prune: bool = False) -> IngestStats:
+        start = time.monotonic()
+        seen: set[str] = set()
+        pending: list[Future] = []
+        for chunk in rows:
+            self._raise_upload_errors()
+            chunk = [r for r in chunk if r.get("sku") is not None]
+            for r in chunk:
+                r["sku"] = str(r["sku"])
+            seen.update(r["sku"] for r in chunk)
+            pending.append(self._process_chunk(chunk))
+            pending = [f for f in pending if f is not None and not f.done()]
+        for f in pending:
+            if f is not None:
+                f.result()
+        self._raise_upload_errors()
+        if prune:
+            self._prune(seen)
+        if self.stats.rows != self.stats.unchanged or self.stats.deleted:
+            bump_collection_version(self.client, self.collection)
+        self.stats.seconds = time.monotonic() - start
+        return self.stats
+
+    def close(self) -> None:
+        self._embed_pool.shutdown(wait=True)
+        self._upload_pool.shutdown(wait=True)
+
+    # -- stages ---------------------------------------------------------------
+    def _process_chunk(self, chunk: list[dict]) -> Future | None:
+        known = self.checkpoint.get_many([r["sku"] for r in chunk])
+        work = []  # (row, fingerprints, needs_text, needs_image, needs_payload, is_new)
+        for r in chunk:
+            payload = row_payload(r)
+            fps = (
+                _fingerprint(row_text(payload)),
+                _fingerprint(payload.get("main_image_file")),
+                _fingerprint(payload),
+            )
+            old = known.get(r["sku"])
+            if old == fps:
+                continue
+            is_new = old is None
+            work.append((payload, fps, is_new or old[0] != fps[0], is_new or old[1] != fps[1], is_new))
+        self.stats.add(rows=len(chunk), unchanged=len(chunk) - len(work))
+        if not work:
+            return None
+
+        text_rows = [w for w in work if w[2] and row_text(w[0])]
+        image_rows = [w for w in work if w[3] and w[0].get("main_image_file")]
+        text_futures = [
+            self._embed_pool.submit(self.embed_texts, [row_text(w[0]) for w in text_rows[i:i + self.text_batch_size]])
+            for i in range(0, len(text_rows), self.text_batch_size)
+        ]
+        image_futures = [self._embed_pool.submit(self._safe_embed_image, w[0]["main_image_file"]) for w in image_rows]
+
+        vectors: dict[str, dict[str, list[float]]] = {w[0]["sku"]: {} for w in work}
+        text_vectors = [v for f in text_futures for v in f.result()]
+        for w, vec in zip(text_rows, text_vectors):
+            vectors[w[0]["sku"]]["text"] = vec
+            if self._store_short:
+                vectors[w[0]["sku"]][config.TEXT_SHORT_VECTOR] = shorten_vector(vec)
+        for w, f in zip(image_rows, image_futures):
+            vec = f.result()
+            if vec is not None:
+                vectors[w[0]["sku"]]["image"] = vec
+        self.stats.add(text_embedded=len(text_rows), image_embedded=sum(1 for f in image_futures if f.result() is not None))
+
+        self._inflight.acquire()
+        future = self._upload_pool.submit(self._upload, work, vectors)
+        future.add_done_callback(self._upload_done)
+        return future
+
+    def _safe_embed_image(self, url: str) -> list[float] | None:
+        try:
+            return self.embed_image(url)
+        except Exception as e:
+            logging.warning(f"Image embedding failed for {url}: {e}")
+            self.stats.add(image_failed=1)
+            return None
+
+    def _upload(self, work: list, vectors: dict[str, dict[str, list[float]]]) -> None:
+        points, partial = [], []
+        for payload, fps, needs_text, needs_image, is_new in work:
+            vecs = vectors[payload["sku"]]
+            if is_new:
+                points.append(qmodels.PointStruct(id=point_id(payload["sku"]), vector=vecs, payload=payload))
+            else:
+                partial.append((payload, vecs))
+        if points:
+            self.client.upsert(self.collection, points=points, wait=True)
+        if partial:
+            # Changed rows of existing points: new vectors (if any) and every
+            # payload go to Qdrant as one batch request.
+            updates = [
+                qmodels.PointVectors(id=point_id(p["sku"]), vector=v) for p, v in partial if v
+            ]
+            operations = (
+                [qmodels.UpdateVectorsOperation(update_vectors=qmodels.UpdateVectors(points=updates))] if updates else []
+            )
+            operations += [
+                qmodels.OverwritePayloadOperation(
+                    overwrite_payload=qmodels.SetPayload(payload=payload, points=[point_id(payload["sku"])])
+                )
+                for payload, _ in partial
+            ]
+            self.client.batch_update_points(self.collection, update_operations=operations, wait=True)
+        entries = []
+        for payload, (text_fp, image_fp, payload_fp), _, needs_image, _ in work:
+            if needs_image and payload.get("main_image_file") and "image" not in vectors[payload["sku"]]:
+                image_fp = None  # embedding failed: retry on the next run
+            entries.append((payload["sku"], text_fp, image_fp, payload_fp))
+        self.checkpoint.save(entries)
+        self.stats.add(upserted=len(points), payload_only=sum(1 for _, v in partial if not v))
+
+    def _upload_done(self, future: Future) -> None:
+        self._inflight.release()
+        if future.exception() is not None:
+            self._errors.append(future.exception())
+
+    def _raise_upload_errors(self) -> None:
+        if self._errors:
+            raise self._errors[0]
+
+    def _prune(self, seen: set[str]) -> None:
+        stale = sorted(self.checkpoint.all_skus() - seen)
+        for i in range(0, len(stale), 1000):
+            part = stale[i:i + 1000]
+            self.client.delete(self.collection, points_selector=qmodels.PointIdsList(points=[point_id(s) for s in part]))
+            self.checkpoint.delete(part)
+        self.stats.add(deleted=len(stale))
+
+
+def make_image_embedder() -> ImageEmbedder:
+    """Download catalog images with a pooled session and embed them with CLIP.
+
+    The downloaded file is sent as is and bypasses the query image cache.
+    """
+    import requests
+    from app.clip_utils import generate_image_embedding_from_bytes
+
+    session = requests.Session()
+    session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=32))
+
+    def embed(url: str) -> list[float]:
+        resp = session.get(url, timeout=30)
+        resp.raise_for_status()
+        filename = os.path.basename(urlparse(url).path) or "image.jpg"
+        return generate_image_embedding_from_bytes(resp.content, filename)
+
+    return embed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default=None, help="Catalog .arrow or .csv (default: Arrow file if built, else CSV)")
+    parser.add_argument("--collection", default=config.QDRANT_COLLECTION)
+    parser.add_argument("--qdrant-path", default=None, help="Use Qdrant local mode at this path")
+    parser.add_argument("--checkpoint", default=".cache/ingest_checkpoint.sqlite")
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--text-batch-size", type=int, default=64)
+    parser.add_argument("--image-workers", type=int, default=8)
+    parser.add_argument("--upload-workers", type=int, default=4)
+    parser.add_argument("--max-inflight", type=int, default=8)
+    parser.add_argument("--prune", action="store_true", help="Delete points whose SKU left the catalog")
+    parser.add_argument("--full", action="store_true", help="Ignore the checkpoint and re-embed everything")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    from app.embedding import embed_texts
+    from app.qdrant_utils import QDRANT_API_KEY, QDRANT_URL
+
+    source = args.source or (config.CATALOG_ARROW if os.path.exists(config.CATALOG_ARROW) else config.CATALOG_CSV)
+    client = QdrantClient(path=args.qdrant_path) if args.qdrant_path else QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
+    ensure_collection(client, args.collection)
+
+    checkpoint = Checkpoint(args.checkpoint)
+    # Fingerprints are only meaningful for the collection and models they were made for.
+    target = f"{args.collection}|{config.TEXT_EMBEDDING_MODEL}|{config.CLIP_ENDPOINT}"
+    if args.full or checkpoint.get_meta("target") != target:
+        checkpoint.reset()
+        checkpoint.set_meta("target", target)
+
+    ingestor = Ingestor(
+        client,
+        checkpoint,
+        # Catalog text is embedded as written and kept out of the query cache.
+        embed_texts=partial(embed_texts, use_cache=False),
+        embed_image=make_image_embedder(),
+        collection=args.collection,
+        text_batch_size=args.text_batch_size,
+        image_workers=args.image_workers,
+        # Local mode is not safe for concurrent writes.
+        upload_workers=1 if args.qdrant_path else args.upload_workers,
+        max_inflight=args.max_inflight,
+    )
+    try:
+        stats = ingestor.run(iter_catalog(source, args.chunk_size), prune=args.prune)
+    finally:
+        ingestor.close()
+    print(json.dumps(stats.as_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# app/metrics.py
+
+"""In-process latency and error metrics for the search pipeline.
+
+Each stage ("clip", "openai_embedding", "qdrant_query", ...) gets a
+Prometheus-style cumulative histogram plus a window of recent samples for
+p50/p95/p99.  Everything lives in process memory and is shared by all
+sessions.  ``METRICS_JSONL`` optionally appends a snapshot every
+``METRICS_EXPORT_INTERVAL`` seconds.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+from app import config
+
+# Upper bounds in seconds, as in Prometheus' default buckets plus a longer tail.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Timeout exceptions of optional clients (httpx, openai), matched by class name.
+_TIMEOUT_NAMES = {"TimeoutException", "APITimeoutError"}
+
+
+def is_timeout(exc: BaseException | None) -> bool:
+    """Whether ``exc`` or an exception it wraps is a timeout."""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if isinstance(exc, TimeoutError) or any(cls.__name__ in _TIMEOUT_NAMES for cls in type(exc).__mro__):
+            return True
+        # qdrant-client keeps the transport error in ``source``.
+        exc = getattr(exc, "source", None) or exc.__cause__ or exc.__context__
+    return False
+
+
+class StageStats:
+    """Counts, histogram buckets and recent samples for one stage."""
+
+    def __init__(self, window: int):
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+        self.timeouts = 0
+        self.buckets = [0] * len(BUCKETS)
+        self.recent: deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.recent.append(seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+    def summary(self) -> dict:
+        p50 = p95 = p99 = None
+        if self.recent:
+            p50, p95, p99 = (np.percentile(np.fromiter(self.recent, float), [50, 95, 99]) * 1000).tolist()
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "mean_ms": self.total / self.count * 1000 if self.count else None,
+            "p50_ms": p50,
+            "p95_ms": p95,
+            "p99_ms": p99,
+        }
+
+
+class Metrics:
+    """Registry of per-stage statistics; thread-safe."""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._stages: dict[str, StageStats] = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def _stage(self, name: str) -> StageStats:
+        stats = self._stages.get(name)
+        if stats is None:
+            stats = self._stages.setdefault(name, StageStats(self.window))
+        return stats
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Record one successful call of ``stage`` that took ``seconds``."""
+        with self._lock:
+            self._stage(stage).observe(seconds)
+
+    def error(self, stage: str, timeout: bool = False) -> None:
+        """Count a failed call; failures are not added to the latency histogram."""
+        with self._lock:
+            stats = self._stage(stage)
+            if timeout:
+                stats.timeouts += 1
+            else:
+                stats.errors += 1
+
+    @contextmanager
+    def timed(self, stage: str):
+        """Time the ``with`` block as one call of ``stage``.
+
+        Exceptions are counted as errors (or timeouts) and re-raised.
+        Control-flow exceptions that are not ``Exception`` subclasses, such
+        as Streamlit's rerun, are not recorded at all.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.error(stage, timeout=is_timeout(e))
+            raise
+        self.observe(stage, time.perf_counter() - start)
+
+    def snapshot(self) -> dict[str, dict]:
+        with self._lock:
+            return {name: stats.summary() for name, stats in sorted(self._stages.items())}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+            self.started = time.time()
+
+    def to_json_line(self) -> str:
+        return json.dumps({"ts": time.time(), "stages": self.snapshot()})
+
+    def to_prometheus(self, prefix: str = "classy_search") -> str:
+        """Render the histograms and counters in Prometheus text format."""
+        with self._lock:
+            stages = sorted((name, stats.count, stats.total, list(stats.buckets), stats.errors, stats.timeouts)
+                            for name, stats in self._stages.items())
+        lines = [
+            f"# HELP {prefix}_stage_seconds Latency of successful calls per search stage.",
+            f"# TYPE {prefix}_stage_seconds histogram",
+        ]
+        for name, count, total, buckets, _, _ in stages:
+            cumulative = 0
+            for bound, n in zip(BUCKETS, buckets):
+                cumulative += n
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{bound:g}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {count}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {total:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {count}')
+        for metric, idx, help_text in (("errors", 4, "Failed calls"), ("timeouts", 5, "Timed-out calls")):
+            lines.append(f"# HELP {prefix}_stage_{metric}_total {help_text} per search stage.")
+            lines.append(f"# TYPE {prefix}_stage_{metric}_total counter")
+            for stage in stages:
+                lines.append(f'{prefix}_stage_{metric}_total{{stage="{stage[0]}"}} {stage[idx]}')
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics(window=config.METRICS_WINDOW)
+
+
+def _export_loop(path: str, interval: float) -> None:
+    while True:
+        time.sleep(interval)
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(metrics.to_json_line() + "\n")
+        except OSError as e:
+            logging.warning(f"Could not write metrics to {path}: {e}")
+
+
+def start_jsonl_export(path: str | None = None, interval: float | None = None) -> None:
+    """Append a snapshot to ``path`` every ``interval`` seconds (once per process)."""
+    path = path or config.METRICS_JSONL
+    if not path or getattr(start_jsonl_export, "started", False):
+        return
+    start_jsonl_export.started = True
+    threading.Thread(
+        target=_export_loop,
+        args=(path, interval or config.METRICS_EXPORT_INTERVAL),
+        name="metrics-export",
+        daemon=True,
+    ).start()
+
+
+start_jsonl_export()
@@ -0,0 +1,141 @@
+# app/paging.py
+
+"""Page-at-a-time access to search results."""
+
+import logging
+import math
+import sys
+import threading
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+
+from app.result_store import CompactResults
+
+# Background prefetch of the next page; shared by all sessions.
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="prefetch")
+
+
+def _slice(results: CompactResults, offset: int, top_k: int) -> CompactResults:
+    return results.slice(offset, offset + top_k)
+
+
+def _size(obj) -> int:
+    """Rough size of a fetch callable: a (nested) partial and its arguments."""
+    if isinstance(obj, partial):
+        return (
+            sys.getsizeof(obj) + _size(obj.func)
+            + sum(_size(a) for a in obj.args) + sum(_size(v) for v in obj.keywords.values())
+        )
+    if isinstance(obj, CompactResults):
+        return obj.nbytes
+    return sys.getsizeof(obj)
+
+
+class ResultPager:
+    """Fetch one page of results on demand and prefetch the next one.
+
+    ``fetch`` is called as ``fetch(offset=..., top_k=...)`` and returns that
+    slice of the ranked results as :class:`CompactResults`.  Pagers stay in
+    the shared result store for the whole session, so ``fetch`` should be
+    cheap to keep: a ``functools.partial`` over the query text, image cache
+    key or point ID rather than over the query vector.  Pages fetched so far
+    are kept as row positions and scores.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[..., CompactResults],
+        total: int,
+        page_size: int,
+        prefetch: bool = True,
+    ):
+        self.fetch = fetch
+        self.total = total
+        self.page_size = page_size
+        self.prefetch = prefetch
+        self._pages: dict[int, CompactResults] = {}
+        self._next_no: int | None = None
+        self._next: Future | None = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_results(cls, results: CompactResults, page_size: int) -> "ResultPager":
+        """Pager over results that are already in memory."""
+        return cls(partial(_slice, results), len(results), page_size, prefetch=False)
+
+    @property
+    def num_pages(self) -> int:
+        return math.ceil(self.total / self.page_size)
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            pages = list(self._pages.values())
+        return sum(p.nbytes for p in pages) + _size(self.fetch)
+
+    def _fetch_page(self, n: int) -> CompactResults:
+        offset = n * self.page_size
+        limit = min(self.page_size, self.total - offset)
+        if limit <= 0:
+            return CompactResults([])
+        return self.fetch(offset=offset, top_k=limit)
+
+    def _keep(self, n: int, future: Future) -> None:
+        if future.exception() is None:
+            with self._lock:
+                self._pages.setdefault(n, future.result())
+
+    def page(self, n: int) -> CompactResults:
+        """Return page ``n`` (0-based) and start fetching page ``n + 1``."""
+        with self._lock:
+            items = self._pages.get(n)
+            pending = self._next if self._next_no == n else None
+        if items is None and pending is not None:
+            try:
+                items = pending.result()
+            except Exception as e:
+                logging.warning(f"Prefetch of page {n} failed, refetching: {e}")
+        if items is None:
+            items = self._fetch_page(n)
+        started = None
+        with self._lock:
+            self._pages[n] = items
+            if (
+                self.prefetch and self.has_next(n) and n + 1 not in self._pages
+                and self._next_no != n + 1
+            ):
+                started = _executor.submit(self._fetch_page, n + 1)
+                self._next_no, self._next = n + 1, started
+        if started is not None:
+            # Outside the lock: a finished future runs the callback right here.
+            started.add_done_callback(partial(self._keep, n + 1))
+        return items
+
+    def upcoming(self, n: int) -> Future | None:
+        """Page ``n + 1`` as a future (already resolved if it is held), or ``None`` if there is none.
+
+        Call after :meth:`page` for page ``n``.
+        """
+        with self._lock:
+            if not self.has_next(n):
+                return None
+            if n + 1 in self._pages:
+                future: Future = Future()
+                future.set_result(self._pages[n + 1])
+                return future
+            return self._next if self._next_no == n + 1 else None
+
+    def has_next(self, n: int) -> bool:
+        """Whether a page follows page ``n`` (which must have been fetched)."""
+        page = self._pages.get(n)
+        return page is not None and len(page) == self.page_size and (n + 1) * self.page_size < self.total
+
+    def iter_batches(self, batch_size: int = 1000) -> Iterator[CompactResults]:
+        """Walk all results in batches, independently of the visible page."""
+        for offset in range(0, self.total, batch_size):
+            items = self.fetch(offset=offset, top_k=min(batch_size, self.total - offset))
+            if len(items):
+                yield items
+            if len(items) < batch_size:
+                return
@@ -1,25 +1,53 @@
 # app/qdrant_utils.py
 
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
 import os
-from qdrant_client import QdrantClient
-from qdrant_client.http import models as qmodels
+import threading
+import time
+
+import numpy as np
 from dotenv import load_dotenv
 
 from app import config
+from app.metrics import metrics
+from app.query_cache import QueryCache
+from app.startup import LazyModule
+
+# qdrant_client is slow to import; it is loaded on first use (or by the
+# start-up warm-up) rather than when a page imports this module.
+qmodels = LazyModule("qdrant_client.http.models")
 
 load_dotenv()
 QDRANT_URL = os.getenv("QDRANT_URL")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
 COLLECTION_NAME = config.QDRANT_COLLECTION
 
+# Payload fields a result card needs; everything else is hydrated on demand.
+CARD_FIELDS = ["sku", "product_name", "main_image_file", "style", "category", "class"]
+
 def get_client():
     if not hasattr(get_client, "instance"):
+        from qdrant_client import QdrantClient
         get_client.instance = QdrantClient(
             url=QDRANT_URL,
             api_key=QDRANT_API_KEY
         )
     return get_client.instance
 
+def get_async_client():
+    """Shared ``AsyncQdrantClient`` for the HTTP API; must be used from one event loop."""
+    if not hasattr(get_async_client, "instance"):
+        from qdrant_client import AsyncQdrantClient
+        get_async_client.instance = AsyncQdrantClient(
+            url=QDRANT_URL,
+            api_key=QDRANT_API_KEY
+        )
+    return get_async_client.instance
+
 def build_filter(payload_filters: dict) -> qmodels.Filter | None:
     must_conditions = []
     for field, values in payload_filters.items():
@@ -34,41 +62,381 @@ def build_filter(payload_filters: dict) -> qmodels.Filter | None:
         must_conditions.append(qmodels.FieldCondition(key=field, match=matcher))
     return qmodels.Filter(must=must_conditions) if must_conditions else None
 
+# ── result cache ────────────────────────────────────────────────────────────
+query_cache = QueryCache(max_entries=config.QUERY_CACHE_SIZE, ttl=config.QUERY_CACHE_TTL)
+_version_lock = threading.Lock()
+_version_state = {"version": None, "checked": float("-inf")}
+
+def _version_due() -> bool:
+    with _version_lock:
+        now = time.monotonic()
+        if now - _version_state["checked"] < config.QUERY_CACHE_VERSION_CHECK:
+            return False
+        _version_state["checked"] = now
+        return True
+
+def _apply_version(info: qmodels.CollectionInfo) -> str | None:
+    version = (info.config.metadata or {}).get("version")
+    with _version_lock:
+        if version != _version_state["version"]:
+            query_cache.clear()
+            _version_state["version"] = version
+    return version
+
+def collection_version() -> str | None:
+    """Version stamp the ingestion job writes into the collection metadata.
+
+    Re-read at most every ``QUERY_CACHE_VERSION_CHECK`` seconds; when it
+    changes the result cache is cleared.
+    """
+    if _version_due():
+        try:
+            return _apply_version(get_client().get_collection(COLLECTION_NAME))
+        except Exception as e:
+            logging.warning(f"Could not read collection version: {e}")
+    return _version_state["version"]
+
+async def acollection_version() -> str | None:
+    """Async counterpart of :func:`collection_version`."""
+    if _version_due():
+        try:
+            return _apply_version(await get_async_client().get_collection(COLLECTION_NAME))
+        except Exception as e:
+            logging.warning(f"Could not read collection version: {e}")
+    return _version_state["version"]
+
+def _canonical_filter(q_filter: qmodels.Filter | None) -> str:
+    """Order-independent JSON form of a filter, for cache keys."""
+    if q_filter is None:
+        return ""
+    data = q_filter.model_dump(exclude_none=True, mode="json")
+    for clause in data.values():
+        if not isinstance(clause, list):
+            continue
+        for cond in clause:
+            match = cond.get("match", {})
+            if "any" in match:
+                match["any"] = sorted(match["any"], key=str)
+        clause.sort(key=lambda c: json.dumps(c, sort_keys=True))
+    return json.dumps(data, sort_keys=True)
+
+def _cache_key(kind: str, query, q_filter: qmodels.Filter | None, version: str | None, **params) -> str | None:
+    """Digest of everything that determines a query's result, or None if caching is off."""
+    if not query_cache.enabled:
+        return None
+    digest = hashlib.sha256(kind.encode())
+    items = sorted(query.items()) if isinstance(query, dict) else [("", query)]
+    for name, value in items:
+        digest.update(name.encode())
+        if isinstance(value, (list, tuple, np.ndarray)):
+            digest.update(np.asarray(value, dtype=np.float32).tobytes())
+        else:
+            digest.update(repr(value).encode())
+    digest.update(_canonical_filter(q_filter).encode())
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    digest.update(str(version).encode())
+    return digest.hexdigest()
+
+def _cached_query(key: str | None, run, stage: str) -> list[qmodels.ScoredPoint]:
+    if key is not None:
+        cached = query_cache.get(key)
+        if cached is not None:
+            return cached
+    with metrics.timed(stage):
+        points = run()
+    if key is not None:
+        query_cache.put(key, points)
+    return points
+
+async def _acached_query(key: str | None, run, stage: str) -> list[qmodels.ScoredPoint]:
+    if key is not None:
+        cached = query_cache.get(key)
+        if cached is not None:
+            return cached
+    with metrics.timed(stage):
+        points = await run()
+    if key is not None:
+        query_cache.put(key, points)
+    return points
+
+def _payload_selector(payload_fields: list[str] | None) -> bool | list[str]:
+    return list(payload_fields) if payload_fields is not None else True
+
+# ── two-stage text search ───────────────────────────────────────────────────
+def shorten_vector(vector: list[float], dim: int | None = None) -> list[float]:
+    """Truncate and re-normalise a text-embedding-3 vector to ``dim``
+    (default ``TEXT_SHORT_DIM``).
+
+    OpenAI's text-embedding-3 models are trained so that this matches asking
+    the API for ``dimensions=dim``.
+    """
+    dim = dim or config.TEXT_SHORT_DIM
+    short = np.asarray(vector[:dim], dtype=np.float32)
+    norm = np.linalg.norm(short)
+    return (short / norm if norm else short).tolist()
+
+def _pool_size(top_k: int, offset: int, depth: int | None) -> int:
+    """Candidate-stage limit: ``depth`` (the whole result list being paged
+    through) so every page is a slice of the same ranking, else just enough
+    for this page."""
+    return max(depth or 0, offset + top_k)
+
+def _short_text_prefetch(vector: list[float], limit: int, q_filter: qmodels.Filter | None) -> qmodels.Prefetch:
+    """Candidate stage: oversampled search on the short text vector."""
+    return qmodels.Prefetch(
+        query=shorten_vector(vector),
+        using=config.TEXT_SHORT_VECTOR,
+        limit=max(limit, int(limit * config.TEXT_RESCORE_OVERSAMPLING)),
+        filter=q_filter,
+        params=qmodels.SearchParams(quantization=qmodels.QuantizationSearchParams(rescore=True)),
+    )
+
+def _vector_query(vector, vector_name, top_k, payload_filters, payload_fields, offset, depth, version) -> tuple[str | None, dict]:
+    q_filter = build_filter(payload_filters or {})
+    rescore = vector_name == "text" and config.TEXT_SEARCH_MODE == "rescore"
+    pool = _pool_size(top_k, offset, depth)
+    key = _cache_key(
+        "vector", vector, q_filter, version,
+        using=vector_name, top_k=top_k, offset=offset, fields=payload_fields,
+        rescore=rescore and (config.TEXT_SHORT_DIM, config.TEXT_RESCORE_OVERSAMPLING, pool),
+    )
+    return key, dict(
+        collection_name=COLLECTION_NAME,
+        prefetch=_short_text_prefetch(vector, pool, q_filter) if rescore else None,
+        query=vector,
+        using=vector_name,
+        limit=top_k,
+        offset=offset,
+        query_filter=q_filter,
+        with_payload=_payload_selector(payload_fields)
+    )
+
 def vector_search(
     vector: list[float],
     vector_name: str,
     top_k: int,
-    payload_filters: dict | None = None
+    payload_filters: dict | None = None,
+    payload_fields: list[str] | None = None,
+    offset: int = 0,
+    depth: int | None = None
 ) -> list[qmodels.ScoredPoint]:
+    """Nearest neighbours of ``vector``.  ``payload_fields`` limits the
+    returned payload to those keys (e.g. ``CARD_FIELDS``); ``None`` returns
+    the full payload.  ``offset`` skips that many top hits (paging); pass the
+    same ``depth`` (total hits paged through) for every page so candidate
+    stages don't change with the offset."""
     client = get_client()
+    key, query = _vector_query(vector, vector_name, top_k, payload_filters, payload_fields, offset, depth, collection_version())
+    return _cached_query(key, lambda: client.query_points(**query).points, "qdrant_vector")
+
+async def avector_search(
+    vector: list[float],
+    vector_name: str,
+    top_k: int,
+    payload_filters: dict | None = None,
+    payload_fields: list[str] | None = None,
+    offset: int = 0,
+    depth: int | None = None
+) -> list[qmodels.ScoredPoint]:
+    """Async counterpart of :func:`vector_search`; shares its result cache."""
+    client = get_async_client()
+    key, query = _vector_query(vector, vector_name, top_k, payload_filters, payload_fields, offset, depth, await acollection_version())
+
+    async def run():
+        return (await client.query_points(**query)).points
+    return await _acached_query(key, run, "qdrant_vector")
+
+def _hybrid_query(vectors, top_k, payload_filters, payload_fields, offset, depth, version) -> tuple[str | None, dict]:
     q_filter = build_filter(payload_filters or {})
-    resp = client.query_points(
+    rescore = "text" in vectors and config.TEXT_SEARCH_MODE == "rescore"
+    # RRF ranks whatever the prefetches return, so their limits must not
+    # depend on the offset.
+    pool = _pool_size(top_k, offset, depth)
+    prefetch = []
+    for field, emb in vectors.items():
+        if field == "text" and rescore:
+            # Full-vector rescoring of the short-vector candidates feeds the fusion.
+            prefetch.append(qmodels.Prefetch(
+                prefetch=_short_text_prefetch(emb, pool, q_filter),
+                query=emb,
+                using=field,
+                limit=pool,
+            ))
+        else:
+            prefetch.append(qmodels.Prefetch(query=emb, using=field, limit=pool))
+    key = _cache_key(
+        "hybrid", vectors, q_filter, version,
+        fusion="rrf", top_k=top_k, offset=offset, pool=pool, fields=payload_fields,
+        rescore=rescore and (config.TEXT_SHORT_DIM, config.TEXT_RESCORE_OVERSAMPLING),
+    )
+    return key, dict(
         collection_name=COLLECTION_NAME,
-        query=vector,
-        using=vector_name,
+        prefetch=prefetch,
+        query=qmodels.FusionQuery(fusion=qmodels.Fusion.RRF),
         limit=top_k,
+        offset=offset,
         query_filter=q_filter,
-        with_payload=True
+        with_payload=_payload_selector(payload_fields)
     )
-    return resp.points
 
 def hybrid_search(
     vectors: dict[str, list[float]],
     top_k: int,
-    payload_filters: dict | None = None
+    payload_filters: dict | None = None,
+    payload_fields: list[str] | None = None,
+    offset: int = 0,
+    depth: int | None = None
 ) -> list[qmodels.ScoredPoint]:
     client = get_client()
-    prefetch = [
-        qmodels.Prefetch(query=emb, using=field, limit=top_k)
-        for field, emb in vectors.items()
-    ]
+    key, query = _hybrid_query(vectors, top_k, payload_filters, payload_fields, offset, depth, collection_version())
+    return _cached_query(key, lambda: client.query_points(**query).points, "qdrant_hybrid")
+
+async def ahybrid_search(
+    vectors: dict[str, list[float]],
+    top_k: int,
+    payload_filters: dict | None = None,
+    payload_fields: list[str] | None = None,
+    offset: int = 0,
+    depth: int | None = None
+) -> list[qmodels.ScoredPoint]:
+    client = get_async_client()
+    key, query = _hybrid_query(vectors, top_k, payload_filters, payload_fields, offset, depth, await acollection_version())
+
+    async def run():
+        return (await client.query_points(**query)).points
+    return await _acached_query(key, run, "qdrant_hybrid")
+
+def batch_vector_search(
+    vectors: list[list[float]],
+    vector_name: str,
+    top_k: int,
+    payload_filters: dict | None = None,
+    payload_fields: list[str] | None = None
+) -> list[list[qmodels.ScoredPoint]]:
+    """Run one nearest-neighbour query per vector in a single round trip.
+
+    All queries share the same filter; results come back in input order.
+    """
+    if not vectors:
+        return []
     q_filter = build_filter(payload_filters or {})
-    resp = client.query_points(
+    requests = [
+        qmodels.QueryRequest(
+            query=vector,
+            using=vector_name,
+            limit=top_k,
+            filter=q_filter,
+            with_payload=_payload_selector(payload_fields),
+        )
+        for vector in vectors
+    ]
+    with metrics.timed("qdrant_batch"):
+        responses = get_client().query_batch_points(collection_name=COLLECTION_NAME, requests=requests)
+    return [resp.points for resp in responses]
+
+def _sku_scroll(sku: str) -> dict:
+    return dict(
         collection_name=COLLECTION_NAME,
-        prefetch=prefetch,
-        query=qmodels.FusionQuery(fusion=qmodels.Fusion.RRF),
+        scroll_filter=build_filter({"sku": sku}),
+        limit=1,
+        with_payload=False,
+        with_vectors=False,
+    )
+
+def find_point_id(sku: str) -> qmodels.ExtendedPointId | None:
+    """Return the ID of the point whose payload ``sku`` matches, if any."""
+    with metrics.timed("qdrant_scroll"):
+        points, _ = get_client().scroll(**_sku_scroll(sku))
+    return points[0].id if points else None
+
+async def afind_point_id(sku: str) -> qmodels.ExtendedPointId | None:
+    with metrics.timed("qdrant_scroll"):
+        points, _ = await get_async_client().scroll(**_sku_scroll(sku))
+    return points[0].id if points else None
+
+def _similar_query(point_id, vector_name, top_k, payload_filters, payload_fields, offset, version) -> tuple[str | None, dict]:
+    q_filter = build_filter(payload_filters or {}) or qmodels.Filter()
+    q_filter.must_not = [*(q_filter.must_not or []), qmodels.HasIdCondition(has_id=[point_id])]
+    key = _cache_key(
+        "similar", point_id, q_filter, version,
+        using=vector_name, top_k=top_k, offset=offset, fields=payload_fields,
+    )
+    return key, dict(
+        collection_name=COLLECTION_NAME,
+        query=point_id,
+        using=vector_name,
         limit=top_k,
+        offset=offset,
         query_filter=q_filter,
-        with_payload=True
+        with_payload=_payload_selector(payload_fields)
+    )
+
+def similar_search(
+    point_id: qmodels.ExtendedPointId | None = None,
+    sku: str | None = None,
+    vector_name: str = "image",
+    top_k: int = 10,
+    payload_filters: dict | None = None,
+    payload_fields: list[str] | None = None,
+    offset: int = 0
+) -> list[qmodels.ScoredPoint]:
+    """Find items similar to a stored point, using its stored vector.
+
+    The source is given by ``point_id`` or looked up by ``sku``; it is
+    excluded from the results.
+    """
+    if point_id is None:
+        if sku is None:
+            raise ValueError("similar_search needs a point_id or a sku")
+        point_id = find_point_id(sku)
+        if point_id is None:
+            return []
+    client = get_client()
+    key, query = _similar_query(point_id, vector_name, top_k, payload_filters, payload_fields, offset, collection_version())
+    return _cached_query(key, lambda: client.query_points(**query).points, "qdrant_similar")
+
+async def asimilar_search(
+    point_id: qmodels.ExtendedPointId | None = None,
+    sku: str | None = None,
+    vector_name: str = "image",
+    top_k: int = 10,
+    payload_filters: dict | None = None,
+    payload_fields: list[str] | None = None,
+    offset: int = 0
+) -> list[qmodels.ScoredPoint]:
+    """Async counterpart of :func:`similar_search`."""
+    if point_id is None:
+        if sku is None:
+            raise ValueError("similar_search needs a point_id or a sku")
+        point_id = await afind_point_id(sku)
+        if point_id is None:
+            return []
+    client = get_async_client()
+    key, query = _similar_query(point_id, vector_name, top_k, payload_filters, payload_fields, offset, await acollection_version())
+
+    async def run():
+        return (await client.query_points(**query)).points
+    return await _acached_query(key, run, "qdrant_similar")
+
+def _retrieve(point_ids) -> dict:
+    return dict(
+        collection_name=COLLECTION_NAME,
+        ids=list(point_ids),
+        with_payload=True,
+        with_vectors=False,
     )
-    return resp.points
+
+def fetch_payloads(point_ids: list[qmodels.ExtendedPointId]) -> dict:
+    """Full payloads for ``point_ids`` in one round trip, keyed by ID."""
+    if not point_ids:
+        return {}
+    with metrics.timed("qdrant_retrieve"):
+        records = get_client().retrieve(**_retrieve(point_ids))
+    return {r.id: r.payload or {} for r in records}
+
+async def afetch_payloads(point_ids: list[qmodels.ExtendedPointId]) -> dict:
+    if not point_ids:
+        return {}
+    with metrics.timed("qdrant_retrieve"):
+        records = await get_async_client().retrieve(**_retrieve(point_ids))
+    return {r.id: r.payload or {} for r in records}
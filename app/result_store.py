@@ -0,0 +1,171 @@
+# app/result_store.py
+
+"""Compact per-session search results.
+
+A result list is kept as catalog row positions plus float32 scores, a few
+KB even for 500 hits.  Card fields are read from the shared, read-only
+catalog frame only for the page being drawn.  Results (usually a
+:class:`app.paging.ResultPager` holding such pages) live in one
+process-wide :class:`ResultStore` keyed by a token in the session, so
+abandoned sessions are evicted after ``RESULTS_IDLE_TTL`` seconds instead of
+holding memory until Streamlit drops them.
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from app import config
+from app.sku_index import SkuIndex
+
+
+class CatalogHit:
+    """Result row shaped like a Qdrant point, as expected by display_results()."""
+
+    __slots__ = ("payload", "score", "id")
+
+    def __init__(self, payload: dict, score: float | None = None, id=None):
+        self.payload = payload
+        self.score = score
+        self.id = id
+
+
+class CompactResults:
+    """Ranked hits as parallel arrays of catalog row positions and scores.
+
+    Hits that are not in the local catalog (position ``-1``) keep their point
+    ID and the payload Qdrant returned in ``extra``, keyed by rank; this is
+    normally empty.
+    """
+
+    __slots__ = ("positions", "scores", "extra")
+
+    def __init__(self, positions, scores=None, extra: dict[int, tuple] | None = None):
+        self.positions = np.asarray(positions, dtype=np.int32)
+        self.scores = (
+            np.full(len(self.positions), np.nan, dtype=np.float32) if scores is None
+            else np.asarray(scores, dtype=np.float32)
+        )
+        self.extra = extra or {}
+
+    @classmethod
+    def from_points(cls, points: list, sku_index: SkuIndex) -> "CompactResults":
+        """Compact Qdrant hits by resolving their payload SKU to a catalog row."""
+        positions = sku_index.first_positions([(p.payload or {}).get("sku", "") for p in points])
+        extra = {rank: (p.id, p.payload or {}) for rank, p in enumerate(points) if positions[rank] < 0}
+        return cls(positions, [p.score for p in points], extra)
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    @property
+    def nbytes(self) -> int:
+        return self.positions.nbytes + self.scores.nbytes + sys.getsizeof(self.extra)
+
+    def slice(self, start: int, stop: int) -> "CompactResults":
+        """Hits ``start:stop`` as their own ``CompactResults``."""
+        extra = {r - start: v for r, v in self.extra.items() if start <= r < stop}
+        return CompactResults(self.positions[start:stop], self.scores[start:stop], extra)
+
+    def _score(self, rank: int) -> float | None:
+        score = self.scores[rank]
+        return None if np.isnan(score) else float(score)
+
+    def hits(self, start: int, stop: int, catalog: pd.DataFrame, fields: list[str]) -> list[CatalogHit]:
+        """Hits ``start:stop`` with ``fields`` filled in from ``catalog``."""
+        stop = min(stop, len(self))
+        ranks = range(start, stop)
+        local = [r for r in ranks if r not in self.extra]
+        cols = [c for c in fields if c in catalog.columns]
+        rows = catalog.iloc[self.positions[local]][cols].to_dict("records")
+        by_rank = {r: {k: v for k, v in row.items() if not pd.isna(v)} for r, row in zip(local, rows)}
+        hits = []
+        for r in ranks:
+            if r in self.extra:
+                point_id, payload = self.extra[r]
+                hits.append(CatalogHit(payload, self._score(r), point_id))
+            else:
+                hits.append(CatalogHit(by_rank[r], self._score(r)))
+        return hits
+
+    def frame(self, catalog: pd.DataFrame, start: int = 0, stop: int | None = None) -> pd.DataFrame:
+        """Full catalog rows for hits ``start:stop`` with a ``score`` column.
+
+        Hits outside the local catalog contribute only their stored payload.
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        if not self.extra:
+            df = catalog.iloc[self.positions[start:stop]].reset_index(drop=True)
+        else:
+            records = []
+            for r in range(start, stop):
+                if r in self.extra:
+                    records.append(self.extra[r][1])
+                else:
+                    records.append(catalog.iloc[self.positions[r]].to_dict())
+            df = pd.DataFrame.from_records(records)
+        return df.assign(score=self.scores[start:stop])
+
+
+class ResultStore:
+    """Process-wide, thread-safe map of session token → results.
+
+    Any object with an ``nbytes`` property can be stored.
+
+    Entries not read or written for ``idle_ttl`` seconds are dropped, as are
+    the least recently used ones beyond ``max_entries``.
+    """
+
+    def __init__(self, idle_ttl: float = 1800.0, max_entries: int = 2000):
+        self.idle_ttl = idle_ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def _evict(self, now: float) -> None:
+        while self._entries:
+            key, (touched, _) = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_entries and now - touched < self.idle_ttl:
+                break
+            del self._entries[key]
+            self.evicted += 1
+
+    def put(self, key: str, results) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (now, results)
+            self._entries.move_to_end(key)
+            self._evict(now)
+
+    def get(self, key: str | None):
+        if key is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries[key] = (now, entry[1])
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._evict(time.monotonic())
+            sizes = [r.nbytes for _, r in self._entries.values()]
+        return {
+            "sessions": len(sizes),
+            "total_kb": sum(sizes) / 1024,
+            "max_kb": max(sizes, default=0) / 1024,
+            "evicted": self.evicted,
+        }
+
+
+result_store = ResultStore(idle_ttl=config.RESULTS_IDLE_TTL, max_entries=config.RESULTS_MAX_SESSIONS)
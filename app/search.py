@@ -1,14 +1,20 @@
-import math
 import uuid
-import requests
-from io import BytesIO
+from collections.abc import Iterator
+from functools import partial
+from itertools import chain
 from PIL import Image
 import streamlit as st
 import pandas as pd
 
-from app.embedding import get_image_embedding, get_text_embedding
-from app.qdrant_utils import vector_search, hybrid_search
-from app.data_utils import art_df, filter_columns_config, filter_options
+from app import search_core
+from app.batch_search import count_zip_images, iter_batch_image_search, iter_zip_images
+from app.metrics import metrics
+from app.paging import ResultPager
+from app.qdrant_utils import CARD_FIELDS
+from app.result_store import CompactResults, result_store
+from app.data_utils import art_df, color_index, filter_columns_config, filter_options, sku_index
+from app.sku_index import normalize_sku, parse_sku_list
+from app.thumbnails import thumbnail_cache, thumbnail_sources
 
 # --- SET PAGE CONFIG FIRST ---
 
@@ -25,11 +31,6 @@ st.markdown(
 PAGE_SIZE = 10
 
 
-def hex_to_rgb(h: str) -> tuple[int, ...]:
-    h = h.lstrip("#")
-    return tuple(int(h[i:i+2], 16) for i in (0, 2, 4))
-
-
 def show_active_filters(filters: dict) -> None:
     if not filters:
         return
@@ -37,32 +38,68 @@ def show_active_filters(filters: dict) -> None:
     st.markdown("**Active filters:** " + " &nbsp; ".join(chips))
 
 
-def display_results(results: list | None, key_prefix: str = "") -> None:
+def _iter_results_csv(pager: ResultPager) -> Iterator[bytes]:
+    """Stream every result of ``pager`` as CSV, one batch of catalog rows at a time."""
+    columns = None
+    for batch in pager.iter_batches():
+        df = batch.frame(art_df)
+        if columns is None:
+            columns = list(df.columns)
+            yield df.to_csv(index=False).encode("utf-8")
+        else:
+            yield df.reindex(columns=columns).to_csv(index=False, header=False).encode("utf-8")
+
+
+def _session_key() -> str:
+    if "results_key" not in st.session_state:
+        st.session_state.results_key = uuid.uuid4().hex
+    return st.session_state.results_key
+
+
+@metrics.timed("render")
+def display_results(results: CompactResults | ResultPager | None, key_prefix: str = "") -> None:
+    """Render one page of results.
+
+    ``results`` is either a ready list (e.g. SKU hits) or a ``ResultPager``
+    that fetches pages from Qdrant on demand.  New results replace the
+    session's entry in the shared result store; ``None`` redraws the
+    session's current results.  Card fields are read from the catalog for
+    the visible page only.
+    """
     if results is not None:
-        st.session_state.search_results = results
+        pager = results if isinstance(results, ResultPager) else ResultPager.from_results(results, PAGE_SIZE)
+        result_store.put(_session_key(), pager)
         st.session_state.page = 0
         st.session_state.results_prefix = key_prefix
-    results = st.session_state.get("search_results", [])
+    pager = result_store.get(st.session_state.get("results_key"))
+    if pager is None:
+        st.info("These results have expired. Please run the search again.")
+        return
     key_prefix = st.session_state.get("results_prefix", key_prefix)
-    if not results:
+    page = st.session_state.get("page", 0)
+    try:
+        hits = pager.page(page)
+    except search_core.QueryExpired:
+        st.info("These results have expired. Please run the search again.")
+        return
+    except Exception as e:
+        st.error(f"Could not load page {page + 1}: {e}")
+        return
+    if not len(hits):
         st.warning("No results found. Try broadening your query or removing some filters.")
         return
 
-    page = st.session_state.get("page", 0)
     start = page * PAGE_SIZE
-    end = start + PAGE_SIZE
-    subset = results[start:end]
-
-    df_results = pd.DataFrame([
-        {**(r.payload or {}), "score": getattr(r, "score", None)} for r in results
-    ])
+    subset = hits.hits(0, len(hits), art_df, CARD_FIELDS)
+    details = search_core.full_payloads(subset)
+    images = thumbnail_sources([pl.get("main_image_file") for pl in details])
 
     num_cols = 5
     for i in range(0, len(subset), num_cols):
         cols = st.columns(num_cols)
         for idx, r in enumerate(subset[i:i+num_cols]):
-            pl = r.payload or {}
-            img_url = pl.get("main_image_file")
+            pl = details[i + idx]
+            img_url = images[i + idx]
             name = pl.get("product_name", "N/A")
             sku = pl.get("sku", "")
             style = pl.get("style", "")
@@ -89,6 +126,9 @@ def display_results(results: list | None, key_prefix: str = "") -> None:
                 with st.expander("View all details"):
                     for k, v in pl.items():
                         st.write(f"**{k}**: {v}")
+                if st.button("More like this", key=f"{key_prefix}_similar_{start + i + idx}"):
+                    st.session_state.similar_source = {"id": getattr(r, "id", None), "sku": sku, "name": name}
+                    st.rerun()
                 st.write("---")
 
     col1, col2, col3 = st.columns(3)
@@ -97,24 +137,56 @@ def display_results(results: list | None, key_prefix: str = "") -> None:
             st.session_state.page = max(page - 1, 0)
             st.rerun()
     with col2:
-        total = len(results)
-        st.write(f"Page {page+1} of {math.ceil(total/PAGE_SIZE)}")
+        st.write(f"Page {page+1} of {pager.num_pages}")
     with col3:
-        if st.button("Next", disabled=end >= len(results), key=f"{key_prefix}_next"):
+        if st.button("Next", disabled=not pager.has_next(page), key=f"{key_prefix}_next"):
             st.session_state.page = page + 1
             st.rerun()
 
-    csv = df_results.to_csv(index=False).encode("utf-8")
+    upcoming = pager.upcoming(page)
+    if thumbnail_cache is not None and upcoming is not None:
+        upcoming.add_done_callback(_prefetch_thumbnails)
+
+    # Generated only when the button is clicked.
     st.download_button(
         "Download results as CSV",
-        csv,
+        lambda: b"".join(_iter_results_csv(pager)),
         "results.csv",
         mime="text/csv",
-        key=str(uuid.uuid4()),
+        key=f"{key_prefix}_download",
     )
 
 
 # ──────────────────────────────  Helpers  ──────────────────────────────
+def _prefetch_thumbnails(upcoming) -> None:
+    """Done-callback of the next page's prefetch: warm its card thumbnails too."""
+    if upcoming.exception() is None:
+        page = upcoming.result()
+        hits = page.hits(0, len(page), art_df, ["main_image_file"])
+        thumbnail_cache.prefetch([h.payload.get("main_image_file") for h in hits])
+
+
+def _fetch_compact(search: partial, offset: int, top_k: int) -> CompactResults:
+    """One slice of ``search``'s hits as catalog row positions and scores.
+
+    Only the SKU of each hit is requested; everything else is read from the
+    catalog when a page is drawn.
+    """
+    return CompactResults.from_points(search(top_k=top_k, offset=offset, payload_fields=["sku"]), sku_index)
+
+
+def _pager(search: partial, top_k: int) -> ResultPager:
+    """Page through ``search`` (a partial of a search_core search) up to ``top_k`` hits.
+
+    ``search`` is kept for the whole session, so it should hold the query
+    text, image cache key or point ID, not a vector.  The first page is
+    fetched immediately so it runs inside the caller's spinner.
+    """
+    pager = ResultPager(partial(_fetch_compact, search), top_k, PAGE_SIZE)
+    pager.page(0)
+    return pager
+
+
 def _build_sidebar() -> tuple[dict[str, list[str]], int, str]:
     """Render the sidebar and return (filters, top_k, search_mode)."""
     with st.sidebar:
@@ -129,10 +201,7 @@ def _build_sidebar() -> tuple[dict[str, list[str]], int, str]:
         if st.checkbox("Filter by Color"):
             picked_colour = st.color_picker("Pick a Color")
             tolerance = st.slider("Colour tolerance (0–441)", 0, 441, 50)
-            target_rgb = hex_to_rgb(picked_colour)
-            tmp = art_df.copy()
-            tmp["_dist"] = tmp["dominant_color_hex"].map(lambda h: math.dist(hex_to_rgb(h), target_rgb))
-            close_hexes = tmp[tmp["_dist"] <= tolerance]["dominant_color_hex"].unique().tolist()
+            close_hexes = color_index.within(picked_colour, tolerance)
             if close_hexes:
                 filters["dominant_color_hex"] = close_hexes
         st.markdown("---")
@@ -146,7 +215,7 @@ def _build_sidebar() -> tuple[dict[str, list[str]], int, str]:
             if selection and "Any" not in selection:
                 filters[col_name] = selection
 
-        top_k = st.slider("Number of results", 1, 100, value=5)
+        top_k = st.slider("Number of results", 1, 500, value=5)
         st.markdown("---")
 
         if st.button("Reset all filters"):
@@ -156,6 +225,34 @@ def _build_sidebar() -> tuple[dict[str, list[str]], int, str]:
     return filters, top_k, search_mode
 
 
+def _run_search(image: Image.Image | None, query: str | None, top_k: int, filters: dict, key_prefix: str) -> bool:
+    """Embed the query, search, and show the first page. Returns True if results were drawn."""
+    with st.spinner("Searching…"):
+        vectors, errors = search_core.embed_query(image, query)
+        # Later pages re-read the vectors from the embedding cache.
+        search = partial(
+            search_core.search_again,
+            query if "text" in vectors else None,
+            search_core.query_image_key(image) if "image" in vectors else None,
+            payload_filters=filters,
+            # Every page and the CSV export slice the same top_k ranking.
+            depth=top_k,
+        )
+        try:
+            res = _pager(search, top_k) if vectors else None
+        except Exception as e:
+            st.error(f"Search failed: {e}")
+            return False
+    if res is None:
+        for provider, msg in errors.items():
+            st.error(f"{provider.capitalize()} embedding failed: {msg}")
+        return False
+    for provider, msg in errors.items():
+        st.warning(f"{provider.capitalize()} embedding unavailable ({msg}); searching without it.")
+    display_results(res, key_prefix=key_prefix)
+    return True
+
+
 def _image_text_tab(search_mode: str, top_k: int, filters: dict) -> bool:
     """Handle the ‘Image & Text Search’ tab. Returns True if new results drawn."""
     new_results_shown = False
@@ -165,35 +262,19 @@ def _image_text_tab(search_mode: str, top_k: int, filters: dict) -> bool:
         if uploaded and st.button("🔍  Search"):
             img = Image.open(uploaded).convert("RGB")
             st.image(img, caption="Uploaded image", width=220)
-            with st.spinner("Searching…"):
-                emb = get_image_embedding(img)
-                res = vector_search(emb, "image", top_k, filters)
-            display_results(res, key_prefix="img_search")
-            new_results_shown = True
+            new_results_shown = _run_search(img, None, top_k, filters, "img_search")
 
     elif search_mode == "Text":
         query = st.text_input("Enter a descriptive query")
         if query and st.button("🔍  Search"):
-            with st.spinner("Searching…"):
-                emb = get_text_embedding(query)
-                res = vector_search(emb, "text", top_k, filters)
-            display_results(res, key_prefix="txt_search")
-            new_results_shown = True
+            new_results_shown = _run_search(None, query, top_k, filters, "txt_search")
 
     else:  # Hybrid
         up_img = st.file_uploader("Upload image (optional)", type=["jpg", "jpeg", "png"])
         query = st.text_input("Enter a descriptive query (optional)")
         if (up_img or query) and st.button("🔍  Search"):
-            vectors = {}
-            if up_img:
-                img = Image.open(up_img).convert("RGB")
-                vectors["image"] = get_image_embedding(img)
-            if query:
-                vectors["text"] = get_text_embedding(query)
-            with st.spinner("Searching…"):
-                res = hybrid_search(vectors, top_k, filters)
-            display_results(res, key_prefix="hyb_search")
-            new_results_shown = True
+            img = Image.open(up_img).convert("RGB") if up_img else None
+            new_results_shown = _run_search(img, query, top_k, filters, "hyb_search")
 
     return new_results_shown
 
@@ -203,40 +284,142 @@ def _sku_tab(top_k: int) -> bool:
     new_results_shown = False
     st.subheader("Find product by SKU")
 
-    sku_query = st.text_input("Enter SKU").upper()
+    sku_query = st.text_input("Enter SKU").strip().upper()
     if st.button("🔍  Search SKU"):
-        hit = art_df[art_df["sku"] == sku_query]
-        st.session_state["sku_hit"] = hit
+        # Row positions only; the rows themselves stay in the shared catalog.
+        st.session_state["sku_hit"] = search_core.sku_positions(sku_query)
 
     if "sku_hit" in st.session_state:
         hit = st.session_state["sku_hit"]
-        if hit.empty:
+        if not len(hit):
             st.warning(f"No product found with SKU `{sku_query}`.")
         else:
-            # Wrap DataFrame rows in dummy points expected by display_results()
-            points = []
-            for _, row in hit.iterrows():
-                class Point:  # simple struct-like helper
-                    pass
-                p = Point()
-                p.payload = row.dropna().to_dict()
-                p.score = None
-                points.append(p)
-            display_results(points, key_prefix="sku_results")
+            display_results(CompactResults(hit), key_prefix="sku_results")
             new_results_shown = True
 
-            # Optional “find similar” feature
-            main_img = hit.iloc[0]["main_image_file"]
-            if main_img and st.button("Find similar items"):
-                img = Image.open(BytesIO(requests.get(main_img).content)).convert("RGB")
-                emb = get_image_embedding(img)
-                similar = vector_search(emb, "image", top_k, {})
-                display_results(similar, key_prefix="find_similar")
-                new_results_shown = True
-
+            # Optional “find similar” feature, using the vector already stored in Qdrant
+            if st.button("Find similar items"):
+                try:
+                    with st.spinner("Searching…"):
+                        point_id = search_core.find_point_id(art_df["sku"].iat[hit[0]])
+                        similar = (
+                            _pager(partial(search_core.similar, point_id), top_k) if point_id is not None
+                            else CompactResults([])
+                        )
+                except Exception as e:
+                    st.error(f"Similar-item search failed: {e}")
+                else:
+                    display_results(similar, key_prefix="find_similar")
+                    new_results_shown = True
+
+    _bulk_sku_lookup()
     return new_results_shown
 
 
+def _bulk_sku_lookup() -> None:
+    """Check a pasted or uploaded list of SKUs against the catalog in one pass."""
+    with st.expander("Bulk SKU lookup"):
+        pasted = st.text_area("Paste SKUs (one per line or comma-separated)")
+        uploaded = st.file_uploader("…or upload a CSV/TXT file of SKUs", type=["csv", "txt"], key="bulk_sku_file")
+        if not st.button("Check SKUs", key="bulk_sku_check"):
+            return
+        skus = parse_sku_list(pasted)
+        if uploaded is not None:
+            if uploaded.name.lower().endswith(".csv"):
+                df = pd.read_csv(uploaded, dtype=str)
+                col = next((c for c in df.columns if c.strip().lower() == "sku"), None)
+                if col is None:  # headerless file: first column holds SKUs
+                    uploaded.seek(0)
+                    df = pd.read_csv(uploaded, dtype=str, header=None)
+                    col = df.columns[0]
+                skus += [normalize_sku(s) for s in df[col].dropna() if s.strip()]
+            else:
+                skus += parse_sku_list(uploaded.getvalue().decode("utf-8", errors="ignore"))
+        if not skus:
+            st.warning("No SKUs provided.")
+            return
+
+        positions, missing = sku_index.lookup_many(skus)
+        found = art_df.iloc[positions]
+        st.write(f"**{len(found)}** found, **{len(missing)}** not in the catalog.")
+        if missing:
+            st.text_area("Missing SKUs", "\n".join(missing), key="bulk_sku_missing")
+        if not found.empty:
+            st.dataframe(found)
+            st.download_button(
+                "Download matches as CSV",
+                found.to_csv(index=False).encode("utf-8"),
+                "sku_matches.csv",
+                mime="text/csv",
+                key="bulk_sku_download",
+            )
+
+
+def _batch_tab(top_k: int, filters: dict) -> None:
+    """Handle the ‘Batch Image Search’ tab: many query images in one go."""
+    st.subheader("Match a folder of images against the catalog")
+    uploads = st.file_uploader(
+        "Upload images or a ZIP archive",
+        type=["jpg", "jpeg", "png", "webp", "zip"],
+        accept_multiple_files=True,
+        key="batch_files",
+    )
+    if uploads and st.button("🔍  Search all", key="batch_search"):
+        items, total = [], 0
+        for up in uploads:
+            if up.name.lower().endswith(".zip"):
+                total += count_zip_images(up)
+                items.append(iter_zip_images(up))
+            else:
+                total += 1
+                items.append([(up.name, up.getvalue())])
+        rows = []
+        progress = st.progress(0.0, text="Embedding and searching…")
+        done = 0
+        for name, points, error in iter_batch_image_search(chain.from_iterable(items), top_k, filters, CARD_FIELDS):
+            done += 1
+            progress.progress(done / max(total, 1), text=f"{done} of {total} images processed")
+            with st.expander(f"{name} — {'error' if error else f'{len(points)} matches'}"):
+                if error:
+                    st.error(error)
+                    continue
+                hits = [
+                    {"rank": rank, "sku": p.payload.get("sku"), "product_name": p.payload.get("product_name"),
+                     "score": p.score}
+                    for rank, p in enumerate(points, start=1)
+                ]
+                st.dataframe(pd.DataFrame(hits), hide_index=True)
+                rows.extend({"query_image": name, **h} for h in hits)
+        progress.progress(1.0, text=f"Done: {done} of {total} images processed")
+        st.session_state.batch_csv = pd.DataFrame(rows).to_csv(index=False).encode("utf-8")
+
+    if st.session_state.get("batch_csv"):
+        st.download_button(
+            "Download all matches as CSV",
+            st.session_state.batch_csv,
+            "batch_matches.csv",
+            mime="text/csv",
+            key="batch_download",
+            on_click="ignore",
+        )
+
+
+def _more_like_this(source: dict, top_k: int, filters: dict) -> None:
+    """Show items similar to a result card, queried from its stored vector."""
+    st.subheader(f"More like “{source['name']}”")
+    try:
+        with st.spinner("Searching…"):
+            point_id = source["id"] if source["id"] is not None else search_core.find_point_id(source["sku"])
+            res = (
+                _pager(partial(search_core.similar, point_id, payload_filters=filters), top_k) if point_id is not None
+                else CompactResults([])
+            )
+    except Exception as e:
+        st.error(f"Similar-item search failed: {e}")
+        return
+    display_results(res, key_prefix="find_similar")
+
+
 # ───────────────────────────────  Main  ────────────────────────────────
 def render() -> None:
     """Entry point for the Streamlit page."""
@@ -248,7 +431,7 @@ def render() -> None:
     show_active_filters(filters)
 
     # ----- tabs --------------------------------------------------------------
-    img_text_tab, sku_tab = st.tabs(["Image & Text Search", "Search by SKU"])
+    img_text_tab, sku_tab, batch_tab = st.tabs(["Image & Text Search", "Search by SKU", "Batch Image Search"])
 
     results_shown = False
     with img_text_tab:
@@ -257,6 +440,15 @@ def render() -> None:
     with sku_tab:
         results_shown |= _sku_tab(top_k)
 
+    with batch_tab:
+        _batch_tab(top_k, filters)
+
+    # ----- "More like this" from any result card ----------------------------
+    similar_source = st.session_state.pop("similar_source", None)
+    if similar_source:
+        _more_like_this(similar_source, top_k, filters)
+        results_shown = True
+
     # ----- fallback: redisplay previous results ------------------------------
-    if not results_shown and st.session_state.get("search_results"):
+    if not results_shown and st.session_state.get("results_key"):
         display_results(None)
\ No newline at end of file
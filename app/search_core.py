@@ -0,0 +1,228 @@
+# app/search_core.py
+
+"""Search without a UI: query embedding, Qdrant queries and result hydration.
+
+The Streamlit pages use the plain functions; the HTTP API (``app.api``) uses
+the ``a``-prefixed async ones.  Both share the embedding and result caches.
+Nothing in here touches Streamlit, so errors are raised (or returned, for
+partial embedding failures) rather than displayed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+from app import catalog, embedding, qdrant_utils
+from app.metrics import metrics
+from app.sku_index import SkuIndex, normalize_sku
+
+if TYPE_CHECKING:
+    from qdrant_client.http import models as qmodels
+
+
+def embed_query(
+    image: Image.Image | None = None,
+    text: str | None = None,
+) -> tuple[dict[str, list[float]], dict[str, str]]:
+    """Embed whichever of ``image``/``text`` is given.
+
+    Returns ``(vectors, errors)`` keyed by "image"/"text"; see
+    :func:`embedding.get_hybrid_embeddings`.
+    """
+    return embedding.get_hybrid_embeddings(image, text)
+
+
+async def aembed_query(
+    image: Image.Image | None = None,
+    text: str | None = None,
+) -> tuple[dict[str, list[float]], dict[str, str]]:
+    return await embedding.aget_hybrid_embeddings(image, text)
+
+
+def search(
+    vectors: dict[str, list[float]],
+    top_k: int,
+    payload_filters: dict | None = None,
+    payload_fields: list[str] | None = None,
+    offset: int = 0,
+    depth: int | None = None,
+) -> list[qmodels.ScoredPoint]:
+    """Search with one named vector, or fuse several with RRF.
+
+    When paging with ``offset``, pass the total number of hits being paged
+    through as ``depth`` on every page so the pages split one ranking.
+    """
+    if not vectors:
+        raise ValueError("search needs at least one query vector")
+    if len(vectors) == 1:
+        (name, vector), = vectors.items()
+        return qdrant_utils.vector_search(vector, name, top_k, payload_filters, payload_fields, offset, depth)
+    return qdrant_utils.hybrid_search(vectors, top_k, payload_filters, payload_fields, offset, depth)
+
+
+async def asearch(
+    vectors: dict[str, list[float]],
+    top_k: int,
+    payload_filters: dict | None = None,
+    payload_fields: list[str] | None = None,
+    offset: int = 0,
+    depth: int | None = None,
+) -> list[qmodels.ScoredPoint]:
+    if not vectors:
+        raise ValueError("search needs at least one query vector")
+    if len(vectors) == 1:
+        (name, vector), = vectors.items()
+        return await qdrant_utils.avector_search(vector, name, top_k, payload_filters, payload_fields, offset, depth)
+    return await qdrant_utils.ahybrid_search(vectors, top_k, payload_filters, payload_fields, offset, depth)
+
+
+class QueryExpired(RuntimeError):
+    """The vector of an earlier query is no longer in the embedding cache."""
+
+
+query_image_key = embedding.image_content_key
+
+
+def query_vectors(text: str | None = None, image_key: str | None = None) -> dict[str, list[float]]:
+    """Vectors of a query embedded earlier, read back from the embedding caches.
+
+    The text is re-embedded if it has left the cache; the image cannot be,
+    so a missing image vector raises :class:`QueryExpired`.
+    """
+    vectors = {}
+    if image_key is not None:
+        vector = embedding.image_cache.get(embedding.IMAGE_EMBEDDING_MODEL, image_key)
+        if vector is None:
+            raise QueryExpired("the query image is no longer cached")
+        vectors["image"] = vector
+    if text:
+        vectors["text"] = embedding.embed_text(text)
+    return vectors
+
+
+def search_again(
+    text: str | None,
+    image_key: str | None,
+    top_k: int,
+    payload_filters: dict | None = None,
+    payload_fields: list[str] | None = None,
+    offset: int = 0,
+    depth: int | None = None,
+) -> list[qmodels.ScoredPoint]:
+    """:func:`search` for a query given by its text and/or image cache key.
+
+    Lets a pager fetch later pages without holding the query vectors.
+    """
+    return search(query_vectors(text, image_key), top_k, payload_filters, payload_fields, offset, depth)
+
+
+find_point_id = qdrant_utils.find_point_id
+afind_point_id = qdrant_utils.afind_point_id
+similar = qdrant_utils.similar_search
+asimilar = qdrant_utils.asimilar_search
+
+
+# Catalog frame and SKU index that payloads are hydrated from.
+_catalog_lock = threading.Lock()
+_catalog: tuple[pd.DataFrame, SkuIndex] | None = None
+
+
+def use_catalog(df: pd.DataFrame, index: SkuIndex) -> None:
+    """Hydrate from an already-loaded catalog (the pages' cached one)."""
+    global _catalog
+    with _catalog_lock:
+        _catalog = df, index
+
+
+def load_catalog() -> tuple[pd.DataFrame, SkuIndex]:
+    """The catalog and its SKU index, loaded on first use.
+
+    Blocking; the API calls it on a worker thread at start-up.
+    """
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            df = catalog.load_catalog()
+            _catalog = df, SkuIndex(df["sku"])
+        return _catalog
+
+
+def sku_positions(sku: str) -> np.ndarray:
+    """Catalog row positions whose SKU matches ``sku`` (normalised)."""
+    _, index = load_catalog()
+    return index.positions(sku).astype(np.int32)
+
+
+def catalog_sku(sku: str) -> str | None:
+    """The catalog's own spelling of ``sku`` (matched normalised), or None."""
+    positions = sku_positions(sku)
+    if not len(positions):
+        return None
+    df, _ = load_catalog()
+    return str(df["sku"].iat[positions[0]])
+
+
+def lookup_sku(sku: str) -> pd.DataFrame:
+    """Catalog rows whose SKU matches ``sku`` (normalised)."""
+    df, _ = load_catalog()
+    return df.iloc[sku_positions(sku)]
+
+
+def _merge_payloads(points: list, local: dict, fetched: dict) -> list[dict]:
+    full = []
+    for r in points:
+        pl = r.payload or {}
+        base = local.get(normalize_sku(pl["sku"])) if pl.get("sku") else None
+        if base is None:
+            base = fetched.get(getattr(r, "id", None), {})
+        full.append({**base, **pl})
+    return full
+
+
+def _missing_ids(points: list, local: dict) -> list:
+    return [
+        r.id for r in points
+        if getattr(r, "id", None) is not None
+        and normalize_sku((r.payload or {}).get("sku", "")) not in local
+    ]
+
+
+def _local_payloads(points: list) -> dict:
+    """Full catalog rows of the points' SKUs (one vectorised lookup), keyed by SKU."""
+    df, index = load_catalog()
+    positions, _ = index.lookup_many([(r.payload or {})["sku"] for r in points if (r.payload or {}).get("sku")])
+    return {normalize_sku(r["sku"]): r.dropna().to_dict() for _, r in df.iloc[positions].iterrows()}
+
+
+def full_payloads(points: list, remote: bool = True) -> list[dict]:
+    """Full payload for each point, hydrated from the local catalog by SKU.
+
+    Points whose SKU is not in the local catalog are fetched from Qdrant in
+    one round trip when ``remote`` is set.
+    """
+    with metrics.timed("payload_hydration"):
+        local = _local_payloads(points)
+        missing = _missing_ids(points, local) if remote else []
+        return _merge_payloads(points, local, qdrant_utils.fetch_payloads(missing))
+
+
+async def afull_payloads(points: list) -> list[dict]:
+    with metrics.timed("payload_hydration"):
+        # Row-by-row pandas work; kept off the event loop.
+        local = await asyncio.to_thread(_local_payloads, points)
+        return _merge_payloads(points, local, await qdrant_utils.afetch_payloads(_missing_ids(points, local)))
+
+
+def hit_dict(point, payload: dict | None = None) -> dict:
+    """JSON-ready ``{"id", "score", "payload"}`` form of a search hit."""
+    return {
+        "id": getattr(point, "id", None),
+        "score": getattr(point, "score", None),
+        "payload": payload if payload is not None else (point.payload or {}),
+    }
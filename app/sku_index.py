@@ -0,0 +1,79 @@
+# app/sku_index.py
+
+"""Hashed SKU → catalog row-position index."""
+
+import re
+from collections.abc import Iterable
+
+import numpy as np
+import pandas as pd
+
+_SPLIT_RE = re.compile(r"[\s,;]+")
+
+
+def normalize_sku(sku) -> str:
+    return str(sku).strip().upper()
+
+
+def parse_sku_list(text: str) -> list[str]:
+    """Split pasted text (newlines, commas, tabs…) into normalised SKUs."""
+    return [normalize_sku(s) for s in _SPLIT_RE.split(text) if s.strip()]
+
+
+class SkuIndex:
+    """Resolve SKUs to row positions in the catalog DataFrame.
+
+    Backed by a ``pd.Index`` so single lookups are hash lookups and bulk
+    lookups are one vectorised ``get_indexer`` call.
+    """
+
+    def __init__(self, skus: pd.Series):
+        self._index = pd.Index(skus.astype("string").str.strip().str.upper(), dtype=object)
+        self._unique = self._index.is_unique
+        # Build the hash table now rather than on the first user lookup.
+        if self._unique:
+            self._index.get_indexer(self._index[:1])
+        else:
+            self._index.get_indexer_non_unique(self._index[:1])
+            # First occurrence of each SKU, for one-to-one lookups.
+            keep = ~self._index.duplicated()
+            self._first = self._index[keep]
+            self._first_rows = np.flatnonzero(keep)
+            self._first.get_indexer(self._first[:1])
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def positions(self, sku: str) -> np.ndarray:
+        """Row positions of ``sku`` (several if the catalog repeats it)."""
+        try:
+            loc = self._index.get_loc(normalize_sku(sku))
+        except KeyError:
+            return np.empty(0, dtype=np.intp)
+        if isinstance(loc, slice):
+            return np.arange(len(self._index), dtype=np.intp)[loc]
+        if isinstance(loc, np.ndarray):
+            return np.flatnonzero(loc)
+        return np.array([loc], dtype=np.intp)
+
+    def lookup_many(self, skus: Iterable[str]) -> tuple[np.ndarray, list[str]]:
+        """Resolve many SKUs at once.
+
+        Returns ``(positions, missing)`` where ``positions`` holds the row of
+        every matched SKU in query order and ``missing`` lists SKUs that are
+        not in the catalog.
+        """
+        queries = pd.Index([normalize_sku(s) for s in skus], dtype=object).drop_duplicates()
+        if self._unique:
+            found = self._index.get_indexer(queries)
+            return found[found >= 0], queries[found < 0].tolist()
+        found, missing = self._index.get_indexer_non_unique(queries)
+        return found[found >= 0], queries[missing].tolist()
+
+    def first_positions(self, skus: Iterable[str]) -> np.ndarray:
+        """Row of each SKU (its first row if repeated), aligned with ``skus``; -1 if missing."""
+        queries = pd.Index([normalize_sku(s) for s in skus], dtype=object)
+        if self._unique:
+            return self._index.get_indexer(queries)
+        found = self._first.get_indexer(queries)
+        return np.where(found >= 0, self._first_rows[found], -1)
@@ -0,0 +1,121 @@
+# app/startup.py
+
+"""Process start-up: lazy imports, background warm-up and a timing report.
+
+The client libraries (``qdrant_client``, ``openai``, ``gradio_client``) take
+most of a cold import, so the app imports them on first use.
+:func:`warm_up` then imports them and opens the Qdrant, OpenAI and CLIP
+connections on background threads.  The first query of a fresh dyno
+therefore pays for neither the imports nor the handshakes.  :func:`report`
+returns how long each step took.
+"""
+
+import importlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from app import config
+
+_t0 = time.perf_counter()
+_started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+_lock = threading.Lock()
+_phases: dict[str, float] = {}
+_warm: dict[str, dict] = {}
+
+
+class LazyModule:
+    """Stand-in for a module that imports it on first attribute access."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr: str):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+@contextmanager
+def phase(name: str):
+    """Time a start-up step.  Only the first run of each step is recorded."""
+    start = time.perf_counter()
+    yield
+    with _lock:
+        _phases.setdefault(name, time.perf_counter() - start)
+
+
+def _warm_qdrant() -> None:
+    from app import qdrant_utils
+    qdrant_utils.get_client().get_collection(qdrant_utils.COLLECTION_NAME)
+
+
+def _warm_openai() -> str | None:
+    from app import openai_utils
+    client = openai_utils.get_client()
+    if client is None:
+        return "skipped: OPENAI_API_KEY not set"
+    client.models.retrieve(config.TEXT_EMBEDDING_MODEL)
+    return None
+
+
+def _warm_clip() -> None:
+    from app import clip_utils
+    clip_utils.warm_up()
+
+
+WARMERS = {"qdrant": _warm_qdrant, "openai": _warm_openai, "clip": _warm_clip}
+
+
+def _run_warmer(name: str, fn) -> None:
+    start = time.perf_counter()
+    entry: dict = {"ok": True}
+    try:
+        note = fn()
+        if note:
+            entry["note"] = note
+    except Exception as e:
+        entry = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        logging.warning(f"Warm-up of {name} failed: {e}")
+    entry["seconds"] = time.perf_counter() - start
+    with _lock:
+        _warm[name] = entry
+
+
+def _warm_all() -> None:
+    with ThreadPoolExecutor(max_workers=len(WARMERS), thread_name_prefix="warm-up") as pool:
+        for name, fn in WARMERS.items():
+            pool.submit(_run_warmer, name, fn)
+    logging.info(f"Startup report: {report()}")
+
+
+def warm_up() -> None:
+    """Warm every service connection in the background, once per process.
+
+    Pages call this after their first render, so the warm-up does not
+    compete with drawing the first page; the API calls it at boot.
+    """
+    if getattr(warm_up, "started", False):
+        return
+    with _lock:
+        if getattr(warm_up, "started", False):
+            return
+        warm_up.started = True
+        _phases.setdefault("ready", time.perf_counter() - _t0)
+    if not config.WARM_UP:
+        return
+    threading.Thread(target=_warm_all, name="warm-up", daemon=True).start()
+
+
+def report() -> dict:
+    """Start-up timings of this process, in seconds."""
+    with _lock:
+        return {
+            "started_at": _started_at,
+            "phases": dict(_phases),
+            "warm_up": {name: dict(entry) for name, entry in _warm.items()},
+        }
@@ -0,0 +1,303 @@
+# app/thumbnails.py
+
+"""Resized result-card thumbnails, kept in an on-disk LRU.
+
+Each catalog image is downloaded once with a pooled HTTP client, shrunk to
+``THUMBNAIL_WIDTH`` pixels and stored under ``THUMBNAIL_CACHE_DIR``.  Files
+that have not been used for the longest time are deleted once the directory
+grows past ``THUMBNAIL_CACHE_MB``.  Several downloads run in parallel, and
+concurrent requests for the same image share one download.  A results page
+never waits for downloads (beyond ``THUMBNAIL_PAGE_WAIT``): cards whose
+thumbnail is not cached yet show the original image while it is fetched in
+the background.  :meth:`prefetch` fills the cache ahead of time, e.g. for
+the next results page.
+
+``st.image`` passes JPEG bytes through unchanged and serves them from a
+content-addressed media URL that browsers cache.  It would re-encode WebP,
+so WebP thumbnails are handed over as data URIs instead (see
+:func:`image_source`).
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from io import BytesIO
+from typing import TYPE_CHECKING
+
+from PIL import Image, ImageOps
+
+from app import config
+from app.metrics import metrics
+
+if TYPE_CHECKING:
+    import httpx
+
+_EXTENSIONS = {"jpeg": "jpg", "webp": "webp"}
+
+
+class ThumbnailCache:
+    """Thumbnails of remote images keyed on URL, width and format."""
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 512 << 20,
+        width: int = 320,
+        image_format: str = "jpeg",
+        quality: int = 80,
+        workers: int = 8,
+        timeout: float = 10.0,
+        retry_after: float = 300.0,
+    ):
+        if image_format not in _EXTENSIONS:
+            raise ValueError(f"Unsupported thumbnail format {image_format!r}; use 'jpeg' or 'webp'")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.width = width
+        self.format = image_format
+        self.quality = quality
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="thumbnail")
+        self._workers = workers
+        self._http: httpx.Client | None = None
+        self._lock = threading.Lock()
+        self._inflight: dict[str, Future] = {}
+        # path → when its download last failed; not retried for retry_after seconds.
+        self._failed: dict[str, float] = {}
+        # path → size, least recently used first; loaded from disk on first use.
+        self._index: OrderedDict[str, int] | None = None
+        self._total = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.evicted = 0
+        self.bytes_fetched = 0
+        self.bytes_stored = 0
+
+    def _client(self) -> httpx.Client:
+        if self._http is None:
+            with self._lock:
+                if self._http is None:
+                    import httpx
+                    self._http = httpx.Client(
+                        timeout=self.timeout,
+                        follow_redirects=True,
+                        limits=httpx.Limits(max_connections=self._workers, max_keepalive_connections=self._workers),
+                    )
+        return self._http
+
+    def _path(self, url: str) -> str:
+        digest = hashlib.sha256(f"{url}|{self.width}|{self.format}|{self.quality}".encode()).hexdigest()
+        return os.path.join(self.directory, digest[:2], f"{digest}.{_EXTENSIONS[self.format]}")
+
+    def _load_index(self) -> OrderedDict[str, int]:
+        """Called with the lock held."""
+        if self._index is None:
+            entries = []
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, path, st.st_size))
+            entries.sort()
+            self._index = OrderedDict((path, size) for _, path, size in entries)
+            self._total = sum(self._index.values())
+        return self._index
+
+    def _touch(self, path: str) -> None:
+        with self._lock:
+            index = self._load_index()
+            if path in index:
+                index.move_to_end(path)
+        try:
+            # The modification time orders the LRU across restarts.
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _store(self, path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            index = self._load_index()
+            self._total += len(data) - index.pop(path, 0)
+            index[path] = len(data)
+            while self._total > self.max_bytes and len(index) > 1:
+                old, size = index.popitem(last=False)
+                self._total -= size
+                self.evicted += 1
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+
+    def _resize(self, data: bytes) -> bytes:
+        with Image.open(BytesIO(data)) as img:
+            # Lets the JPEG decoder skip most of the pixels of large images.
+            img.draft("RGB", (self.width, self.width * 4))
+            thumb = ImageOps.exif_transpose(img)
+            thumb.thumbnail((self.width, self.width * 4))
+            if self.format == "jpeg" or thumb.mode not in ("RGB", "RGBA"):
+                thumb = thumb.convert("RGB")
+            out = BytesIO()
+            thumb.save(out, format=self.format.upper(), quality=self.quality)
+        return out.getvalue()
+
+    def _fetch(self, url: str, path: str) -> bytes:
+        with metrics.timed("thumbnail_fetch"):
+            resp = self._client().get(url)
+            resp.raise_for_status()
+            thumb = self._resize(resp.content)
+        self._store(path, thumb)
+        with self._lock:
+            self.misses += 1
+            self.bytes_fetched += len(resp.content)
+            self.bytes_stored += len(thumb)
+        return thumb
+
+    def _submit(self, url: str) -> Future | None:
+        """Future for ``url``'s thumbnail, sharing downloads already in flight.
+
+        ``None`` if the download failed less than ``retry_after`` seconds ago.
+        """
+        path = self._path(url)
+        with self._lock:
+            future = self._inflight.get(path)
+            if future is not None:
+                return future
+            if time.monotonic() - self._failed.get(path, -self.retry_after) < self.retry_after:
+                return None
+            self._failed.pop(path, None)
+            future = self._executor.submit(self._fetch, url, path)
+            self._inflight[path] = future
+
+        def done(f: Future) -> None:
+            with self._lock:
+                self._inflight.pop(path, None)
+                if f.exception() is not None:
+                    self.errors += 1
+                    self._failed[path] = time.monotonic()
+                    logging.warning(f"Thumbnail of {url} failed: {f.exception()}")
+
+        future.add_done_callback(done)
+        return future
+
+    def _cached(self, url: str) -> bytes | None:
+        path = self._path(url)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        self._touch(path)
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def get_many(self, urls: list[str | None], timeout: float | None = None) -> list[bytes | None]:
+        """Thumbnails for ``urls``, fetching the missing ones in parallel.
+
+        Waits at most ``timeout`` seconds (default: the fetch timeout); a
+        thumbnail that failed or is not ready is ``None``.
+        """
+        out: list[bytes | None] = [None] * len(urls)
+        pending: dict[Future, list[int]] = {}
+        for i, url in enumerate(urls):
+            if not url:
+                continue
+            out[i] = self._cached(url)
+            if out[i] is None:
+                future = self._submit(url)
+                if future is not None:
+                    pending.setdefault(future, []).append(i)
+        if pending:
+            done, _ = wait(pending, timeout=self.timeout if timeout is None else timeout)
+            for future in done:
+                if future.exception() is None:
+                    for i in pending[future]:
+                        out[i] = future.result()
+        return out
+
+    def prefetch(self, urls: list[str | None]) -> None:
+        """Start fetching thumbnails that are not cached yet; returns immediately."""
+        for url in urls:
+            if url and not os.path.exists(self._path(url)):
+                self._submit(url)
+
+    def clear(self) -> None:
+        with self._lock:
+            paths = list(self._load_index())
+            self._index = OrderedDict()
+            self._failed.clear()
+            self._total = 0
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            index = self._load_index()
+            return {
+                "entries": len(index),
+                "size_mb": self._total / (1 << 20),
+                "hits": self.hits,
+                "misses": self.misses,
+                "errors": self.errors,
+                "failing": len(self._failed),
+                "evicted": self.evicted,
+                "inflight": len(self._inflight),
+                "fetched_mb": self.bytes_fetched / (1 << 20),
+                "stored_mb": self.bytes_stored / (1 << 20),
+            }
+
+
+def image_source(data: bytes, image_format: str = config.THUMBNAIL_FORMAT) -> bytes | str:
+    """What to pass to ``st.image`` for a thumbnail so it is sent without re-encoding."""
+    if image_format == "jpeg":
+        return data
+    return f"data:image/{image_format};base64,{base64.b64encode(data).decode()}"
+
+
+def thumbnail_sources(urls: list[str | None], timeout: float = config.THUMBNAIL_PAGE_WAIT) -> list[bytes | str | None]:
+    """``st.image`` sources for ``urls``: a thumbnail, or the original URL as a fallback.
+
+    Waits at most ``timeout`` seconds for thumbnails that are not cached;
+    those still missing keep downloading for the next time they are shown.
+    """
+    if thumbnail_cache is None:
+        return list(urls)
+    start = time.perf_counter()
+    thumbs = thumbnail_cache.get_many(urls, timeout)
+    metrics.observe("thumbnails_page", time.perf_counter() - start)
+    return [image_source(t) if t is not None else url for url, t in zip(urls, thumbs)]
+
+
+thumbnail_cache = (
+    ThumbnailCache(
+        config.THUMBNAIL_CACHE_DIR,
+        max_bytes=int(config.THUMBNAIL_CACHE_MB * (1 << 20)),
+        width=config.THUMBNAIL_WIDTH,
+        image_format=config.THUMBNAIL_FORMAT,
+        quality=config.THUMBNAIL_QUALITY,
+        workers=config.THUMBNAIL_WORKERS,
+        timeout=config.THUMBNAIL_TIMEOUT,
+    )
+    if config.THUMBNAIL_CACHE_DIR
+    else None
+)
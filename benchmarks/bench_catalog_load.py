@@ -0,0 +1,52 @@
+# benchmarks/bench_catalog_load.py
+
+"""Cold-load time and peak RSS of the CSV vs the memory-mapped Arrow catalog.
+
+Each loader runs in a fresh interpreter so the numbers reflect one worker
+process starting up.
+
+    python -m benchmarks.bench_catalog_load --csv data/products_05_13.csv --arrow data/products.arrow
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+from app import config
+
+_PROBE = """
+import json, resource, time
+from app import catalog
+start = time.perf_counter()
+df = catalog.{loader}({path!r})
+df["category"].value_counts()
+elapsed = time.perf_counter() - start
+print(json.dumps({{"rows": len(df), "load_ms": elapsed * 1000,
+                  "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+"""
+
+
+def _probe(loader: str, path: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(loader=loader, path=path)],
+        check=True, capture_output=True, text=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=config.CATALOG_CSV)
+    parser.add_argument("--arrow", default=config.CATALOG_ARROW)
+    args = parser.parse_args()
+    report = {
+        "csv": _probe("read_catalog_csv", args.csv),
+        "arrow_mmap": _probe("read_catalog", args.arrow),
+    }
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+# benchmarks/bench_clip_resilience.py
+
+"""CLIP endpoint pool (hedging, routing, circuit breaking) against local stubs.
+
+Starts ``benchmarks.clip_stub`` servers with injected faults and drives
+``app.endpoint_pool.EndpointPool`` with the app's own Gradio transport
+(``clip_utils._predict``):
+
+    tail      one stub with a slow tail; no hedging vs hedging on the same stub
+              vs hedging across two identical stubs
+    routing   a fast and a slow stub; share of requests each one gets
+    outage    a healthy stub and one that always fails; requests keep succeeding
+    down      a single stub that always fails; the breaker opens and calls fail fast
+    half_open a single slow stub that fails half the time, with a breaker that
+              opens on every failure and half-opens at once: most calls are
+              trial calls that run past the hedge delay with nothing to hedge
+              on (run one at a time)
+
+Reports latency percentiles, errors and ``EndpointPool.stats()`` as JSON,
+plus ``caller_cpu_share``: the CPU time of the threads blocked in
+``EndpointPool.call`` as a share of their wall time, over calls that waited
+at least 50 ms.  Waiting on endpoints should cost next to no CPU.  The script exits non-zero if a scenario's
+share reaches ``--max-caller-cpu``, which catches busy-waiting in the
+hedging loop.
+
+    python -m benchmarks.bench_clip_resilience --queries 300 --concurrency 8
+    python -m benchmarks.bench_clip_resilience --scenarios tail --slow-rate 0.1 --slow-ms 5000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+SCENARIOS = ("tail", "routing", "outage", "down", "half_open")
+
+
+def _images(n: int) -> list[bytes]:
+    out = []
+    for i in range(n):
+        buf = BytesIO()
+        Image.new("RGB", (32, 32), (i * 37 % 256, i * 91 % 256, i * 13 % 256)).save(buf, format="JPEG")
+        out.append(buf.getvalue())
+    return out
+
+
+def run(pool, images: list[bytes], concurrency: int) -> dict:
+    from app import clip_utils
+
+    # Build every endpoint's Gradio client first so setup is not measured.
+    for ep in pool.endpoints:
+        clip_utils._endpoint_client(ep)
+
+    def timed(data):
+        start, cpu = time.perf_counter(), time.thread_time()
+        try:
+            pool.call(data, "query.jpg")
+            err = None
+        except Exception as e:
+            err = type(e).__name__
+        return time.perf_counter() - start, time.thread_time() - cpu, err
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as workers:
+        outcomes = list(workers.map(timed, images))
+    wall = time.perf_counter() - start
+    ok = np.array([t for t, _, err in outcomes if err is None]) * 1000
+    failed = np.array([t for t, _, err in outcomes if err is not None]) * 1000
+    errors: dict[str, int] = {}
+    for _, _, err in outcomes:
+        if err is not None:
+            errors[err] = errors.get(err, 0) + 1
+    p50, p95, p99 = np.percentile(ok, [50, 95, 99]).tolist() if len(ok) else (None,) * 3
+    return {
+        "queries": len(images),
+        "throughput_qps": len(ok) / wall,
+        "p50_ms": p50,
+        "p95_ms": p95,
+        "p99_ms": p99,
+        "max_ms": float(ok.max()) if len(ok) else None,
+        "errors": errors,
+        "mean_failure_ms": float(failed.mean()) if len(failed) else None,
+        "caller_cpu_share": (
+            sum(c for t, c, _ in outcomes if t >= 0.05) / max(sum(t for t, _, _ in outcomes if t >= 0.05), 1e-9)
+        ),
+        "pool": pool.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--port", type=int, default=7861, help="first stub port; stubs use consecutive ports")
+    parser.add_argument("--delay-ms", type=float, default=100.0, help="normal stub latency")
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="fraction of slow requests in 'tail'")
+    parser.add_argument("--slow-ms", type=float, default=3000.0)
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--hedge-quantile", type=float, default=0.95)
+    parser.add_argument("--max-caller-cpu", type=float, default=0.05,
+                        help="fail if callers of EndpointPool.call spend this share of their time on CPU")
+    parser.add_argument("--output", default=None, help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    os.environ["EMBEDDING_CACHE_DIR"] = ""
+    from app import clip_utils
+    from app.endpoint_pool import EndpointPool
+    from benchmarks.clip_stub import serve
+
+    ports = iter(range(args.port, args.port + 100))
+
+    def stub(**faults) -> str:
+        return serve(next(ports), **faults)[1]
+
+    def pool(urls: list[str], **options) -> EndpointPool:
+        options = {
+            "timeout": args.timeout,
+            "hedge_quantile": args.hedge_quantile,
+            "hedge_delay": args.delay_ms * 3 / 1000,
+            "workers": 4 * args.concurrency,
+            **options,
+        }
+        return EndpointPool(urls, clip_utils._predict, **options)
+
+    images = _images(args.queries)
+    report = {"delay_ms": args.delay_ms, "concurrency": args.concurrency, "scenarios": {}}
+    for name in args.scenarios:
+        if name == "tail":
+            tail = {"delay_ms": args.delay_ms, "slow_rate": args.slow_rate, "slow_ms": args.slow_ms}
+            first, second = stub(**tail), stub(**tail)
+            result = {
+                "no_hedging": run(pool([first], max_attempts=1), images, args.concurrency),
+                "hedged_same_endpoint": run(pool([first]), images, args.concurrency),
+                "hedged_two_endpoints": run(pool([first, second]), images, args.concurrency),
+            }
+        elif name == "routing":
+            result = run(
+                pool([stub(delay_ms=args.delay_ms * 4), stub(delay_ms=args.delay_ms)]), images, args.concurrency
+            )
+        elif name == "outage":
+            result = run(
+                pool([stub(delay_ms=args.delay_ms, fail_rate=1.0), stub(delay_ms=args.delay_ms)], explore=0.2),
+                images, args.concurrency,
+            )
+        elif name == "down":
+            result = run(
+                pool([stub(delay_ms=args.delay_ms, fail_rate=1.0)], reset_after=60.0), images, args.concurrency
+            )
+        else:
+            flaky = stub(delay_ms=args.delay_ms * 10, fail_rate=0.5)
+            result = run(pool([flaky], failure_threshold=1, reset_after=0.0), images[:20], 1)
+        report["scenarios"][name] = result
+        print(f"{name}: done", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    def runs(result: dict) -> list[dict]:
+        return [result] if "caller_cpu_share" in result else list(result.values())
+
+    busy = [
+        f"{name}: {r['caller_cpu_share']:.2f}"
+        for name, result in report["scenarios"].items()
+        for r in runs(result)
+        if r["caller_cpu_share"] >= args.max_caller_cpu
+    ]
+    if busy:
+        sys.exit(f"EndpointPool.call callers busy on CPU (share above {args.max_caller_cpu:g}): {', '.join(busy)}")
+
+
+if __name__ == "__main__":
+    main()
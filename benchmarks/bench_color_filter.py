@@ -0,0 +1,81 @@
+# benchmarks/bench_color_filter.py
+
+"""Colour-filter benchmark: per-row ``math.dist`` vs the precomputed index.
+
+    python -m benchmarks.bench_color_filter --rows 100000 1000000
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.color_index import ColorIndex
+
+
+def _hex_to_rgb(h: str) -> tuple[int, ...]:
+    h = h.lstrip("#")
+    return tuple(int(h[i:i+2], 16) for i in (0, 2, 4))
+
+
+def legacy_filter(df: pd.DataFrame, picked: str, tolerance: float) -> list[str]:
+    """The sidebar implementation this index replaced."""
+    target_rgb = _hex_to_rgb(picked)
+    tmp = df.copy()
+    tmp["_dist"] = tmp["dominant_color_hex"].map(lambda h: math.dist(_hex_to_rgb(h), target_rgb))
+    return tmp[tmp["_dist"] <= tolerance]["dominant_color_hex"].unique().tolist()
+
+
+def synthetic_catalog(rows: int, unique_colours: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    palette = np.array([f"#{v:06x}" for v in rng.integers(0, 0xFFFFFF, unique_colours)], dtype=object)
+    return pd.DataFrame({
+        "sku": [f"SKU{i:07d}" for i in range(rows)],
+        "dominant_color_hex": palette[rng.integers(0, unique_colours, rows)],
+    })
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--unique-colours", type=int, default=50_000)
+    parser.add_argument("--tolerance", type=float, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    picked = "#8040c0"
+    report = []
+    for rows in args.rows:
+        df = synthetic_catalog(rows, args.unique_colours)
+        start = time.perf_counter()
+        index = ColorIndex.from_series(df["dominant_color_hex"])
+        build_ms = (time.perf_counter() - start) * 1000
+        expected = set(legacy_filter(df, picked, args.tolerance))
+        assert set(index.within(picked, args.tolerance)) == expected
+        report.append({
+            "rows": rows,
+            "unique_colours": len(index),
+            "matches": len(expected),
+            "legacy_ms": _best_of(lambda: legacy_filter(df, picked, args.tolerance), args.repeat),
+            "index_build_ms": build_ms,
+            "index_query_ms": _best_of(lambda: index.within(picked, args.tolerance), args.repeat),
+        })
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# benchmarks/bench_image_embedding.py
+
+"""Microbenchmark for the image-embedding path against a local CLIP stub.
+
+Compares the old flow (temp JPEG + new ``gradio_client.Client`` per call)
+with the pooled in-memory upload and with content-hash cache hits.
+
+    python -m benchmarks.bench_image_embedding --iterations 20
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+
+def _timed(fn, iterations: int) -> dict:
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "mean_ms": statistics.fmean(samples),
+        "p50_ms": samples[len(samples) // 2],
+        "max_ms": samples[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--port", type=int, default=7861)
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="Latency injected by the stub")
+    parser.add_argument("--size", type=int, default=1024, help="Edge length of the test images")
+    args = parser.parse_args()
+
+    from benchmarks.clip_stub import serve
+
+    stub, url = serve(args.port, args.delay_ms)
+    # Point the app at the stub before its modules read the configuration.
+    os.environ["CLIP_ENDPOINT"] = url
+    os.environ["EMBEDDING_CACHE_DIR"] = ""
+    from gradio_client import Client, handle_file
+    from app import clip_utils, embedding
+
+    rng = np.random.default_rng(0)
+    images = [
+        Image.fromarray(rng.integers(0, 255, (args.size, args.size, 3), dtype=np.uint8))
+        for _ in range(args.iterations)
+    ]
+
+    def baseline(i):
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as tmp:
+            images[i].save(tmp.name)
+            result = Client(url, verbose=False).predict(image=handle_file(tmp.name), api_name="/predict")
+        clip_utils.parse_embedding(result)
+
+    def pooled(i):
+        embedding.get_image_embedding(images[i])
+
+    def cached(i):
+        embedding.get_image_embedding(images[i])
+
+    report = {
+        "temp_file_new_client": _timed(baseline, args.iterations),
+        "pooled_in_memory": _timed(pooled, args.iterations),
+        "cache_hit": _timed(cached, args.iterations),
+    }
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    stub.close()
+
+
+if __name__ == "__main__":
+    main()
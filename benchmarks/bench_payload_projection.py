@@ -0,0 +1,89 @@
+# benchmarks/bench_payload_projection.py
+
+"""Full payload vs card-field projection for ``vector_search``.
+
+Loads a synthetic collection with long descriptions and reports query
+latency and serialized response size at ``top_k``.  Local mode shows the
+size reduction; point ``--qdrant-url`` at a scratch server to see the
+network and deserialization cost as well.
+
+    python -m benchmarks.bench_payload_projection --points 20000 --top-k 100
+    python -m benchmarks.bench_payload_projection --qdrant-url http://localhost:6333
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qmodels
+
+from app import qdrant_utils
+
+DIM = 64
+
+
+def load_collection(client: QdrantClient, n: int, description_words: int) -> None:
+    rng = np.random.default_rng(0)
+    client.create_collection(
+        qdrant_utils.COLLECTION_NAME,
+        vectors_config={"text": qmodels.VectorParams(size=DIM, distance=qmodels.Distance.COSINE)},
+    )
+    words = np.array("canvas abstract modern framed print oil gallery wrapped colour texture".split())
+    for start in range(0, n, 1000):
+        ids = range(start, min(start + 1000, n))
+        vecs = rng.standard_normal((len(ids), DIM)).astype(np.float32)
+        client.upsert(qdrant_utils.COLLECTION_NAME, points=[
+            qmodels.PointStruct(id=i, vector={"text": v.tolist()}, payload={
+                "sku": f"SKU{i:07d}",
+                "product_name": f"Artwork {i}",
+                "main_image_file": f"https://example.com/img/{i}.jpg",
+                "style": "Modern",
+                "category": "Wall Art",
+                "class": "Canvas",
+                "description": " ".join(rng.choice(words, description_words)),
+                "materials": " ".join(rng.choice(words, description_words // 4)),
+                "dimensions": {"w": 24, "h": 36},
+            })
+            for i, v in zip(ids, vecs)
+        ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=20_000)
+    parser.add_argument("--top-k", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=30)
+    parser.add_argument("--description-words", type=int, default=400)
+    parser.add_argument("--qdrant-url", default=None, help="Scratch Qdrant server (default: local mode)")
+    args = parser.parse_args()
+
+    client = QdrantClient(url=args.qdrant_url) if args.qdrant_url else QdrantClient(":memory:")
+    qdrant_utils.COLLECTION_NAME = "bench_payload_projection"
+    if client.collection_exists(qdrant_utils.COLLECTION_NAME):
+        client.delete_collection(qdrant_utils.COLLECTION_NAME)
+    qdrant_utils.get_client.instance = client
+    load_collection(client, args.points, args.description_words)
+    queries = np.random.default_rng(1).standard_normal((args.queries, DIM)).tolist()
+
+    report = {}
+    for label, fields in (("full_payload", None), ("card_fields", qdrant_utils.CARD_FIELDS)):
+        times, sizes = [], []
+        for q in queries:
+            start = time.perf_counter()
+            points = qdrant_utils.vector_search(q, "text", args.top_k, payload_fields=fields)
+            times.append((time.perf_counter() - start) * 1000)
+            sizes.append(sum(len(p.model_dump_json()) for p in points))
+        report[label] = {
+            "p50_ms": statistics.median(times),
+            "mean_response_bytes": statistics.fmean(sizes),
+        }
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
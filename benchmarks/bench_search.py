@@ -0,0 +1,276 @@
+# benchmarks/bench_search.py
+
+"""End-to-end search benchmark with offline stand-ins for every service.
+
+Loads a synthetic catalog of ``--points`` items into Qdrant local mode (or a
+scratch server via ``--qdrant-url``).  OpenAI and the CLIP Space are
+replaced by deterministic stub embedders that sleep for ``--text-latency-ms``
+/ ``--image-latency-ms`` (plus up to ``--jitter-ms``).  The benchmark then
+drives the app's own search path at each ``--concurrency`` level:
+
+    text      query embedding + vector_search on "text"
+    image     query embedding + vector_search on "image"
+    hybrid    both embeddings + hybrid_search (RRF)
+    filtered  text search with style/category filters (build_filter)
+    colour    ColorIndex.within + text search filtered on the matching colours
+    sku       SkuIndex lookup of single SKUs in the catalog frame
+
+For each scenario it reports throughput, latency percentiles, errors and the
+per-stage numbers from ``app.metrics``, as JSON.  The result cache is off
+unless ``--cache`` is given.  Local mode scores every vector in Python, so
+large catalogs want small ``--text-dim``/``--image-dim`` or a real server.
+
+    python -m benchmarks.bench_search --points 10000 --concurrency 1 8 32
+    python -m benchmarks.bench_search --points 1000000 --text-dim 64 --image-dim 32 --scenarios sku colour
+    python -m benchmarks.bench_search --qdrant-url http://localhost:6333 --output bench.json
+"""
+
+import argparse
+import hashlib
+import json
+import platform
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qmodels
+
+from app import config, embedding, ingest, qdrant_utils, search_core
+from app.color_index import ColorIndex
+from app.metrics import metrics
+from app.sku_index import SkuIndex
+
+COLLECTION = "bench_search"
+SCENARIOS = ("text", "image", "hybrid", "filtered", "colour", "sku")
+
+STYLES = ["Modern", "Abstract", "Classic", "Contemporary", "Rustic", "Minimalist", "Pop Art", "Coastal"]
+CATEGORIES = ["Wall Art", "Canvas", "Framed Print", "Poster", "Metal Art", "Photography"]
+CLASSES = ["Canvas", "Paper", "Metal", "Wood", "Acrylic"]
+WORDS = "blue abstract canvas modern framed print oil gallery wrapped texture ocean sunset floral city vintage".split()
+
+
+class StubEmbedder:
+    """Deterministic unit vectors derived from the input, after an injected delay."""
+
+    def __init__(self, dim: int, latency_ms: float = 0.0, jitter_ms: float = 0.0):
+        self.dim = dim
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+
+    def vector(self, key: bytes) -> list[float]:
+        seed = int.from_bytes(hashlib.sha256(key).digest()[:8], "little")
+        vec = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return (vec / np.linalg.norm(vec)).tolist()
+
+    def _sleep(self) -> None:
+        delay = self.latency + random.random() * self.jitter
+        if delay:
+            time.sleep(delay)
+
+    def text(self, text: str) -> list[float]:
+        self._sleep()
+        return self.vector(text.encode())
+
+    def image(self, image: Image.Image) -> list[float]:
+        self._sleep()
+        return self.vector(image.tobytes())
+
+
+def synthetic_catalog(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    palette = np.array([f"#{v:06x}" for v in rng.integers(0, 0xFFFFFF, min(n, 5000))], dtype=object)
+    return pd.DataFrame({
+        "sku": [f"SKU{i:07d}" for i in range(n)],
+        "product_name": [f"Artwork {i}" for i in range(n)],
+        "main_image_file": [f"https://example.com/img/{i}.jpg" for i in range(n)],
+        "style": np.array(STYLES, dtype=object)[rng.integers(0, len(STYLES), n)],
+        "category": np.array(CATEGORIES, dtype=object)[rng.integers(0, len(CATEGORIES), n)],
+        "class": np.array(CLASSES, dtype=object)[rng.integers(0, len(CLASSES), n)],
+        "dominant_color_hex": palette[rng.integers(0, len(palette), n)],
+    })
+
+
+def _unit_rows(rng: np.random.Generator, n: int, dim: int) -> np.ndarray:
+    vecs = rng.standard_normal((n, dim)).astype(np.float32)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+def load(client: QdrantClient, df: pd.DataFrame, batch_size: int = 2000) -> float:
+    """Create the collection with the app's schema and fill it; returns seconds."""
+    start = time.perf_counter()
+    if client.collection_exists(COLLECTION):
+        client.delete_collection(COLLECTION)
+    ingest.ensure_collection(client, COLLECTION)
+    rng = np.random.default_rng(1)
+    payload_cols = ["sku", "product_name", "main_image_file", "style", "category", "class", "dominant_color_hex"]
+    for lo in range(0, len(df), batch_size):
+        chunk = df.iloc[lo:lo + batch_size]
+        text = _unit_rows(rng, len(chunk), config.TEXT_EMBEDDING_DIM)
+        short = text[:, :config.TEXT_SHORT_DIM]
+        short = short / np.linalg.norm(short, axis=1, keepdims=True)
+        image = _unit_rows(rng, len(chunk), config.IMAGE_EMBEDDING_DIM)
+        client.upsert(COLLECTION, wait=True, points=[
+            qmodels.PointStruct(
+                id=lo + i,
+                vector={"text": text[i].tolist(), config.TEXT_SHORT_VECTOR: short[i].tolist(), "image": image[i].tolist()},
+                payload=payload,
+            )
+            for i, payload in enumerate(chunk[payload_cols].to_dict("records"))
+        ])
+    return time.perf_counter() - start
+
+
+def _query_text(i: int) -> str:
+    rng = random.Random(i)
+    return " ".join(rng.sample(WORDS, 3))
+
+
+def _query_image(i: int) -> Image.Image:
+    return Image.new("RGB", (8, 8), (i * 37 % 256, i * 91 % 256, i * 13 % 256))
+
+
+def make_scenarios(df: pd.DataFrame, top_k: int) -> dict:
+    color_index = ColorIndex.from_series(df["dominant_color_hex"], space=config.COLOR_DISTANCE_SPACE)
+    sku_index = SkuIndex(df["sku"])
+
+    def embed_search(image, text, filters=None):
+        vectors, errors = search_core.embed_query(image, text)
+        if errors:
+            raise RuntimeError(f"embedding failed: {errors}")
+        return search_core.search(vectors, top_k, filters, qdrant_utils.CARD_FIELDS)
+
+    def filtered(i):
+        rng = random.Random(i)
+        filters = {"style": rng.sample(STYLES, 2), "category": rng.choice(CATEGORIES)}
+        return embed_search(None, _query_text(i), filters)
+
+    def colour(i):
+        target = "#{:06x}".format(random.Random(i).randrange(0xFFFFFF))
+        hexes = color_index.within(target, 60)
+        return embed_search(None, _query_text(i), {"dominant_color_hex": hexes}) if hexes else []
+
+    def sku(i):
+        return df.iloc[sku_index.positions(f"sku{random.Random(i).randrange(len(df)):07d}")]
+
+    return {
+        "text": lambda i: embed_search(None, _query_text(i)),
+        "image": lambda i: embed_search(_query_image(i), None),
+        "hybrid": lambda i: embed_search(_query_image(i), _query_text(i)),
+        "filtered": filtered,
+        "colour": colour,
+        "sku": sku,
+    }
+
+
+def run_scenario(fn, queries: int, concurrency: int, warmup: int) -> dict:
+    for i in range(warmup):
+        fn(-1 - i)
+    metrics.reset()
+
+    def timed(i):
+        start = time.perf_counter()
+        try:
+            fn(i)
+            return time.perf_counter() - start, None
+        except Exception as e:
+            return time.perf_counter() - start, f"{type(e).__name__}: {e}"
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(timed, range(queries)))
+    wall = time.perf_counter() - start
+    latencies = np.array([t for t, err in outcomes if err is None]) * 1000
+    errors = [err for _, err in outcomes if err is not None]
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]).tolist() if len(latencies) else (None,) * 3
+    return {
+        "concurrency": concurrency,
+        "queries": queries,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "throughput_qps": len(latencies) / wall,
+        "mean_ms": float(latencies.mean()) if len(latencies) else None,
+        "p50_ms": p50,
+        "p95_ms": p95,
+        "p99_ms": p99,
+        "max_ms": float(latencies.max()) if len(latencies) else None,
+        "stages": metrics.snapshot(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=10_000)
+    parser.add_argument("--text-dim", type=int, default=256, help="stub text embedding size (production: 3072)")
+    parser.add_argument("--image-dim", type=int, default=128, help="stub image embedding size (production: 768)")
+    parser.add_argument("--text-latency-ms", type=float, default=50.0)
+    parser.add_argument("--image-latency-ms", type=float, default=150.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--queries", type=int, default=200, help="queries per scenario and concurrency level")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--search-mode", choices=["full", "rescore"], default=config.TEXT_SEARCH_MODE)
+    parser.add_argument("--cache", action="store_true", help="keep the search result cache on")
+    parser.add_argument("--qdrant-url", default=None, help="Scratch Qdrant server (default: local mode)")
+    parser.add_argument("--output", default=None, help="write the JSON report here instead of stdout")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    config.TEXT_EMBEDDING_DIM = args.text_dim
+    config.IMAGE_EMBEDDING_DIM = args.image_dim
+    config.TEXT_SHORT_DIM = min(config.TEXT_SHORT_DIM, args.text_dim)
+    config.TEXT_SEARCH_MODE = args.search_mode
+    if not args.cache:
+        qdrant_utils.query_cache.ttl = 0
+
+    text_stub = StubEmbedder(args.text_dim, args.text_latency_ms, args.jitter_ms)
+    image_stub = StubEmbedder(args.image_dim, args.image_latency_ms, args.jitter_ms)
+    embedding.embed_text = text_stub.text
+    embedding.get_image_embedding = image_stub.image
+    # Enough embedding workers that the pool is not the bottleneck being measured.
+    embedding._executor = ThreadPoolExecutor(max(config.EMBEDDING_WORKERS, 2 * max(args.concurrency)), "embed")
+
+    client = QdrantClient(url=args.qdrant_url) if args.qdrant_url else QdrantClient(":memory:")
+    qdrant_utils.get_client.instance = client
+    qdrant_utils.COLLECTION_NAME = COLLECTION
+
+    df = synthetic_catalog(args.points, args.seed)
+    load_seconds = load(client, df)
+    scenarios = make_scenarios(df, args.top_k)
+
+    report = {
+        "points": args.points,
+        "qdrant": args.qdrant_url or "local",
+        "text_dim": args.text_dim,
+        "image_dim": args.image_dim,
+        "search_mode": args.search_mode,
+        "stub_latency_ms": {"text": args.text_latency_ms, "image": args.image_latency_ms, "jitter": args.jitter_ms},
+        "top_k": args.top_k,
+        "result_cache": args.cache,
+        "python": platform.python_version(),
+        "load_seconds": load_seconds,
+        "scenarios": {},
+    }
+    for name in args.scenarios:
+        report["scenarios"][name] = [
+            run_scenario(scenarios[name], args.queries, c, args.warmup) for c in args.concurrency
+        ]
+        print(f"{name}: done", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# benchmarks/bench_text_rescore.py
+
+"""Recall vs latency of two-stage text search (short-vector prefetch + full rescoring).
+
+Ground truth is exact cosine search over the full vectors, computed with
+NumPy.  Synthetic vectors have variance that decays along the dimensions,
+loosely imitating text-embedding-3's Matryoshka training; pass ``--vectors``
+with an ``.npy`` dump of real embeddings for meaningful recall numbers.
+Local mode scores every vector in Python, so only ``--qdrant-url`` runs give
+representative latencies.
+
+    python -m benchmarks.bench_text_rescore --points 20000 --short-dims 128 256 512
+    python -m benchmarks.bench_text_rescore --qdrant-url http://localhost:6333 --quantization scalar
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qmodels
+
+from app import config, qdrant_utils
+
+COLLECTION = "bench_text_rescore"
+
+
+def synthetic_vectors(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    vecs = rng.standard_normal((n, dim)).astype(np.float32) / np.sqrt(np.arange(1, dim + 1, dtype=np.float32))
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+def _quantization(mode: str):
+    if mode == "scalar":
+        return qmodels.ScalarQuantization(scalar=qmodels.ScalarQuantizationConfig(type=qmodels.ScalarType.INT8, always_ram=True))
+    if mode == "binary":
+        return qmodels.BinaryQuantization(binary=qmodels.BinaryQuantizationConfig(always_ram=True))
+    return None
+
+
+def load(client: QdrantClient, vecs: np.ndarray, short_dims: list[int], quantization: str) -> None:
+    if client.collection_exists(COLLECTION):
+        client.delete_collection(COLLECTION)
+    vectors_config = {"text": qmodels.VectorParams(size=vecs.shape[1], distance=qmodels.Distance.COSINE)}
+    for d in short_dims:
+        vectors_config[f"text_short_{d}"] = qmodels.VectorParams(
+            size=d, distance=qmodels.Distance.COSINE, quantization_config=_quantization(quantization)
+        )
+    client.create_collection(COLLECTION, vectors_config=vectors_config)
+    for start in range(0, len(vecs), 500):
+        batch = vecs[start:start + 500]
+        client.upsert(COLLECTION, points=[
+            qmodels.PointStruct(
+                id=start + i,
+                vector={"text": v.tolist(), **{f"text_short_{d}": qdrant_utils.shorten_vector(v, d) for d in short_dims}},
+            )
+            for i, v in enumerate(batch)
+        ])
+
+
+def run(queries: np.ndarray, truth: list[set], top_k: int) -> dict:
+    times, recalls = [], []
+    for q, expected in zip(queries, truth):
+        start = time.perf_counter()
+        hits = qdrant_utils.vector_search(q.tolist(), "text", top_k)
+        times.append((time.perf_counter() - start) * 1000)
+        recalls.append(len(expected & {p.id for p in hits}) / top_k)
+    times.sort()
+    return {
+        "recall": statistics.fmean(recalls),
+        "p50_ms": times[len(times) // 2],
+        "p95_ms": times[int(len(times) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=20_000)
+    parser.add_argument("--dim", type=int, default=config.TEXT_EMBEDDING_DIM)
+    parser.add_argument("--vectors", default=None, help=".npy file of real full-size embeddings")
+    parser.add_argument("--short-dims", type=int, nargs="+", default=[128, 256, 512])
+    parser.add_argument("--oversampling", type=float, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--quantization", choices=["none", "scalar", "binary"], default="none")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--qdrant-url", default=None, help="Scratch Qdrant server (default: local mode)")
+    args = parser.parse_args()
+
+    vecs = np.load(args.vectors).astype(np.float32) if args.vectors else synthetic_vectors(args.points, args.dim)
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    rng = np.random.default_rng(1)
+    # Queries are perturbed copies of catalog items, so they have true neighbours.
+    queries = vecs[rng.integers(0, len(vecs), args.queries)] + 0.05 * synthetic_vectors(args.queries, vecs.shape[1], seed=2)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    truth = [set(np.argsort(-(vecs @ q))[:args.top_k].tolist()) for q in queries]
+
+    client = QdrantClient(url=args.qdrant_url) if args.qdrant_url else QdrantClient(":memory:")
+    qdrant_utils.get_client.instance = client
+    qdrant_utils.COLLECTION_NAME = COLLECTION
+    config.QUERY_CACHE_TTL = 0
+    qdrant_utils.query_cache.ttl = 0
+    load(client, vecs, args.short_dims, args.quantization)
+
+    config.TEXT_SEARCH_MODE = "full"
+    report = {"points": len(vecs), "dim": vecs.shape[1], "quantization": args.quantization,
+              "full": run(queries, truth, args.top_k), "rescore": []}
+    config.TEXT_SEARCH_MODE = "rescore"
+    for d in args.short_dims:
+        config.TEXT_SHORT_DIM = d
+        config.TEXT_SHORT_VECTOR = f"text_short_{d}"
+        for factor in args.oversampling:
+            config.TEXT_RESCORE_OVERSAMPLING = factor
+            report["rescore"].append({"short_dim": d, "oversampling": factor, **run(queries, truth, args.top_k)})
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/clip_stub.py
+
+"""Local stand-in for the CLIP Hugging Face Space.
+
+Serves the same ``/predict`` API (image in, 768 floats out) with a
+deterministic fake embedding and injectable faults: a fixed delay, a
+``--slow-rate`` fraction of requests that take ``--slow-ms`` instead (a
+queueing or cold-start tail), and a ``--fail-rate`` fraction that errors.
+Requires the ``gradio`` package, which is not an app dependency.
+
+    python -m benchmarks.clip_stub --port 7861 --delay-ms 150
+    python -m benchmarks.clip_stub --port 7862 --delay-ms 100 --slow-rate 0.05 --slow-ms 4000
+"""
+
+import argparse
+import hashlib
+import threading
+import time
+
+import numpy as np
+
+EMBEDDING_DIM = 768
+
+
+def fake_embedding(data: bytes) -> list[float]:
+    """Deterministic unit vector derived from the image bytes."""
+    seed = int.from_bytes(hashlib.sha256(data).digest()[:8], "little")
+    vec = np.random.default_rng(seed).standard_normal(EMBEDDING_DIM)
+    return (vec / np.linalg.norm(vec)).tolist()
+
+
+def build_app(delay_ms: float = 0.0, fail_rate: float = 0.0, slow_rate: float = 0.0, slow_ms: float = 0.0):
+    import gradio as gr
+
+    rng = np.random.default_rng(0)
+    rng_lock = threading.Lock()
+
+    def predict(image):
+        with rng_lock:
+            slow = slow_rate and rng.random() < slow_rate
+            fail = fail_rate and rng.random() < fail_rate
+        delay = slow_ms if slow else delay_ms
+        if delay:
+            time.sleep(delay / 1000)
+        if fail:
+            raise gr.Error("injected failure")
+        return fake_embedding(image.tobytes())
+
+    return gr.Interface(fn=predict, inputs=gr.Image(type="pil"), outputs="json", api_name="predict")
+
+
+def serve(port: int, delay_ms: float = 0.0, fail_rate: float = 0.0, slow_rate: float = 0.0, slow_ms: float = 0.0):
+    """Launch the stub without blocking and return ``(app, url)``."""
+    app = build_app(delay_ms, fail_rate, slow_rate, slow_ms)
+    app.queue(default_concurrency_limit=None)
+    _, url, _ = app.launch(server_name="127.0.0.1", server_port=port, prevent_thread_lock=True, quiet=True)
+    return app, url
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=7861)
+    parser.add_argument("--delay-ms", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    app = build_app(args.delay_ms, args.fail_rate, args.slow_rate, args.slow_ms)
+    app.queue(default_concurrency_limit=None)
+    app.launch(server_name="127.0.0.1", server_port=args.port)
+
+
+if __name__ == "__main__":
+    main()
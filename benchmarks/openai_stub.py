@@ -0,0 +1,150 @@
+# benchmarks/openai_stub.py
+
+"""Local stand-in for the OpenAI endpoints the app uses.
+
+Serves ``POST /v1/chat/completions`` in the JSON format ``app.enrich``
+asks for and ``POST /v1/embeddings`` with deterministic vectors.  Latency
+and failures are injectable: ``--rate-limit-rate`` answers that fraction of
+requests with 429 (plus ``Retry-After``), ``--fail-rate`` with 500, and
+``--drop-rate`` leaves that fraction of batch items out of chat replies.
+
+    python -m benchmarks.openai_stub --port 8089 --delay-ms 300 --rate-limit-rate 0.1
+    python -m app.enrich --base-url http://127.0.0.1:8089/v1 --api-key test
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+
+def fake_vector(text: str, dim: int) -> list[float]:
+    seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+    vec = np.random.default_rng(seed).standard_normal(dim)
+    return (vec / np.linalg.norm(vec)).tolist()
+
+
+def fake_enrichment(description: str) -> tuple[str, list[str]]:
+    words = [w.strip(".,;:!?").lower() for w in description.split()]
+    summary = " ".join(description.split()[:12]).rstrip(".,;:") + "."
+    tags = sorted({w for w in words if len(w) > 4}, key=lambda w: (-words.count(w), w))[:5]
+    return summary, tags
+
+
+def build_app(
+    delay_ms: float = 0.0,
+    rate_limit_rate: float = 0.0,
+    fail_rate: float = 0.0,
+    drop_rate: float = 0.0,
+    embedding_dim: int = 3072,
+    seed: int = 0,
+) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    app.state.counts = {"chat": 0, "embeddings": 0, "rate_limited": 0, "failed": 0}
+
+    def roll() -> float:
+        with lock:
+            return rng.random()
+
+    def injected_error() -> JSONResponse | None:
+        if delay_ms:
+            time.sleep(delay_ms / 1000)
+        r = roll()
+        if r < rate_limit_rate:
+            app.state.counts["rate_limited"] += 1
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                status_code=429,
+                headers={"retry-after": "0.2"},
+            )
+        if r < rate_limit_rate + fail_rate:
+            app.state.counts["failed"] += 1
+            return JSONResponse({"error": {"message": "injected failure", "type": "server_error"}}, status_code=500)
+        return None
+
+    # Plain (sync) handlers run in the server's thread pool, so delays overlap.
+    @app.post("/v1/chat/completions")
+    def chat(body: dict):
+        error = injected_error()
+        if error is not None:
+            return error
+        app.state.counts["chat"] += 1
+        products = json.loads(body["messages"][-1]["content"])["products"]
+        items = []
+        for p in products:
+            if roll() < drop_rate:
+                continue
+            summary, tags = fake_enrichment(p["description"])
+            items.append({"id": p["id"], "summary": summary, "tags": tags})
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body["model"],
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": json.dumps({"items": items})},
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    @app.post("/v1/embeddings")
+    def embeddings(body: dict):
+        error = injected_error()
+        if error is not None:
+            return error
+        app.state.counts["embeddings"] += 1
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        return {
+            "object": "list",
+            "model": body["model"],
+            "data": [
+                {"object": "embedding", "index": i, "embedding": fake_vector(text, body.get("dimensions") or embedding_dim)}
+                for i, text in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+
+    @app.get("/stub/counts")
+    def counts():
+        return app.state.counts
+
+    return app
+
+
+def serve(port: int, **options) -> tuple[uvicorn.Server, str]:
+    """Start the stub on a background thread and return ``(server, base_url)``."""
+    server = uvicorn.Server(uvicorn.Config(build_app(**options), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--delay-ms", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--embedding-dim", type=int, default=3072)
+    args = parser.parse_args()
+    uvicorn.run(
+        build_app(args.delay_ms, args.rate_limit_rate, args.fail_rate, args.drop_rate, args.embedding_dim),
+        host="127.0.0.1", port=args.port, log_level="warning",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,8 @@
-from app import admin
+from app import startup
+
+with startup.phase("app_import"):
+    from app import admin
 
 if __name__ == "__main__":
     admin.render()
+    startup.warm_up()
@@ -1,4 +1,8 @@
-from app import analytics
+from app import startup
+
+with startup.phase("app_import"):
+    from app import analytics
 
 if __name__ == "__main__":
     analytics.render()
+    startup.warm_up()